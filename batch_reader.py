@@ -0,0 +1,154 @@
+# Headless bulk reading generation.
+#
+# Reads one request per line from a JSONL file, e.g.
+#   {"id": "r1", "spread": "three", "query": "Will the move go well?"}
+# draws the cards, generates the reading through an async client with a
+# bounded number of concurrent requests and writes one JSON result per line
+# as soon as each reading finishes. Throughput, latency percentiles,
+# rate-limit retries and tokens per reading are printed to stderr at the end.
+#
+#   python batch_reader.py requests.jsonl readings.jsonl --concurrency 8
+#
+# Set TAROT_FAKE_LLM=1 to run against the offline fake client.
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from deck import deck
+from llm_transport import RATE_LIMITED, ReadingError
+from spreads import SPREADS
+import tarot_reading
+from tarot_reading import draw_cards, generate_tarot_reading_async
+from token_accounting import TOKENS_PER_MINUTE, token_accountant
+
+DEFAULT_CONCURRENCY = 4
+
+
+class BatchStats:
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.rate_limit_retries = 0
+        self.latencies = []
+
+    def count_retry(self, error):
+        if error.kind == RATE_LIMITED:
+            self.rate_limit_retries += 1
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+async def run_request(request, output, stats, use_cache):
+    spread = request.get("spread", "one")
+    query = request.get("query", "")
+    result = {"id": request.get("id"), "spread": spread, "query": query}
+    start = time.perf_counter()
+    try:
+        cards = draw_cards(SPREADS[spread].num_cards)
+        result["cards"] = [card.name for card in cards]
+        result["card_ids"] = deck.ids(cards)
+        result["reversed"] = [card.reversed for card in cards]
+        result["reading"] = await generate_tarot_reading_async(
+            cards, query, use_cache=use_cache, on_retry=stats.count_retry, spread=spread
+        )
+        stats.completed += 1
+    except ReadingError as e:
+        result["error"] = {"kind": e.kind, "message": e.message}
+        stats.failed += 1
+    except Exception as e:
+        # e.g. an unknown spread name in the request
+        result["error"] = {"kind": type(e).__name__, "message": str(e)}
+        stats.failed += 1
+    latency = time.perf_counter() - start
+    stats.latencies.append(latency)
+    result["latency"] = round(latency, 4)
+    output.write(json.dumps(result) + "\n")
+    output.flush()
+
+
+def read_requests(input_file):
+    for line_number, line in enumerate(input_file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"Skipping line {line_number}: {e}", file=sys.stderr)
+            continue
+        if not isinstance(request, dict):
+            print(f"Skipping line {line_number}: expected a JSON object", file=sys.stderr)
+            continue
+        yield request
+
+
+async def run_batch(input_file, output, concurrency=DEFAULT_CONCURRENCY, use_cache=True):
+    stats = BatchStats()
+    slots = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    async def run_in_slot(request):
+        try:
+            await run_request(request, output, stats, use_cache)
+        finally:
+            slots.release()
+
+    # Requests are read lazily, so only `concurrency` of them are in memory
+    for request in read_requests(input_file):
+        await slots.acquire()
+        task = asyncio.create_task(run_in_slot(request))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.wait(tasks)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate tarot readings in bulk from a JSONL file")
+    parser.add_argument("input", help="JSONL file with one {spread, query, id} request per line ('-' for stdin)")
+    parser.add_argument("output", nargs="?", default="-", help="JSONL file for the results (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--no-cache", action="store_true", help="always call the API, even for cached readings")
+    parser.add_argument("--similar-queries", action="store_true",
+                        help="reuse cached readings of near-identical questions asked with the same cards")
+    parser.add_argument("--tokens-per-minute", type=int, default=TOKENS_PER_MINUTE,
+                        help="token budget matching the API plan's limit; 0 turns it off")
+    args = parser.parse_args()
+    tarot_reading.similar_queries_enabled = args.similar_queries
+    token_accountant.set_tokens_per_minute(args.tokens_per_minute)
+
+    input_file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        stats = asyncio.run(run_batch(input_file, output, args.concurrency, not args.no_cache))
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    total = stats.completed + stats.failed
+    print(f"readings:           {stats.completed} ok, {stats.failed} failed", file=sys.stderr)
+    print(f"throughput:         {total / elapsed:.2f} readings/s", file=sys.stderr)
+    print(f"latency p50 / p95:  {stats.percentile(0.5):.3f}s / {stats.percentile(0.95):.3f}s", file=sys.stderr)
+    print(f"rate-limit retries: {stats.rate_limit_retries}", file=sys.stderr)
+    budget = token_accountant.budget
+    if budget is not None:
+        print(f"token budget waits: {budget.waits} ({budget.wait_seconds:.1f}s)", file=sys.stderr)
+    for spread, tokens in token_accountant.report().items():
+        print(f"tokens ({spread}):".ljust(20) + f"{tokens['prompt_tokens_per_reading']:.0f} in"
+              f" + {tokens['completion_tokens_per_reading']:.0f} out per reading,"
+              f" max_tokens {tokens['max_tokens']}, {tokens['truncated']} truncated", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Reading history at scale: fills a fresh history file with synthetic
+# readings through the batched writer, then times the first and a deep page
+# of the plain listing and of full-text searches. Page times should stay flat
+# as the history grows.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from deck import deck
+from fake_llm import CANNED_READING
+from reading_history import ReadingHistory
+from spreads import SPREADS
+
+QUERIES = ["Will the new job work out?", "What should I focus on this month?", "How will the move go?", ""]
+
+
+def fill(history, entries):
+    rng = random.Random(42)
+    spreads = list(SPREADS.values())
+    start = time.perf_counter()
+    for _ in range(entries):
+        spread = rng.choice(spreads)
+        cards = [deck.orient(card, rng.random() < 0.5) for card in rng.sample(deck.cards, spread.num_cards)]
+        history.record(spread.name, cards, rng.choice(QUERIES), CANNED_READING, rng.uniform(0.5, 5))
+    queued = time.perf_counter() - start
+    history.flush()
+    return queued, time.perf_counter() - start
+
+
+def time_pages(history, search, pages, page_size):
+    # Seconds for the first page and for the last of `pages` consecutive pages
+    before_id = None
+    timings = []
+    for _ in range(pages):
+        start = time.perf_counter()
+        entries = history.page(before_id, page_size, search)
+        timings.append(time.perf_counter() - start)
+        if not entries:
+            break
+        before_id = entries[-1].id
+    return timings[0], timings[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark history writes, paging and search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=20, help="pages to walk for the deep page timing")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            history = ReadingHistory(os.path.join(directory, "history.sqlite3"))
+            queued, written = fill(history, size)
+            print(f"{size} entries: record() {1e6 * queued / size:.1f} us each, all written in {written:.2f}s")
+            for search in (None, "job", "tower reversed", "devil"):
+                first, deep = time_pages(history, search, args.pages, args.page_size)
+                label = f"search {search!r}" if search else "listing"
+                print(f"  {label:<26} first page {1000 * first:6.2f} ms   page {args.pages} {1000 * deep:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
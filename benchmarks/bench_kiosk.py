@@ -0,0 +1,195 @@
+# Memory of N reader stations: N processes of one window each, against one
+# process in kiosk mode with N sessions.
+#
+# Every station draws each spread a few times at the same canvas size and
+# gets its readings from the fake LLM client, then reports its memory. All
+# stations of a run stay alive until every one has reported, so the
+# proportional set size (PSS, Linux) splits the pages they share (Python,
+# Tk and PIL libraries) between them; RSS is listed too but counts those
+# pages once per process.
+#
+# With a display the stations open real windows and click their spread
+# buttons. Without one they run headless like bench_suite: redraws go to a
+# stand-in canvas and the scaled image cache holds PIL images, so the Tk
+# widgets themselves are not measured.
+#
+#   python benchmarks/bench_kiosk.py --stations 1 2 4 8
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+# Size of every canvas, so the stations of a kiosk share scaled images the
+# way identical station windows would
+CANVAS_SIZE = (1280, 800)
+
+
+def has_display():
+    return bool(os.environ.get("DISPLAY")) or sys.platform in ("win32", "darwin")
+
+
+def memory():
+    # (PSS, RSS) in bytes; PSS is None where the kernel does not report it
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            # The first line is the address range
+            fields = dict(line.split(":", 1) for line in smaps.readlines()[1:])
+        return int(fields["Pss"].split()[0]) * 1024, int(fields["Rss"].split()[0]) * 1024
+    except (OSError, KeyError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return None, peak if sys.platform == "darwin" else peak * 1024
+
+
+def spread_buttons(widget, labels):
+    import tkinter as tk
+    for child in widget.winfo_children():
+        if isinstance(child, tk.Button) and child.cget("text") in labels:
+            yield child
+        yield from spread_buttons(child, labels)
+
+
+def run_windows(sessions, draws):
+    import tkinter as tk
+    import main
+    from spreads import SPREADS
+
+    root = tk.Tk()
+    if sessions > 1:
+        windows = main.open_kiosk(root, sessions)
+    else:
+        main.setup_main_gui(root)
+        windows = [root]
+    for window in windows:
+        window.geometry(f"{CANVAS_SIZE[0] + 280}x{CANVAS_SIZE[1]}")
+    root.update()
+    labels = {spread.label for spread in SPREADS.values()}
+    for _ in range(draws):
+        for window in windows:
+            for button in spread_buttons(window, labels):
+                button.invoke()
+                root.update()
+    # Let the last readings stream in
+    deadline = time.monotonic() + 10
+    while main.reading_executor.in_flight and time.monotonic() < deadline:
+        root.update()
+        time.sleep(0.01)
+    root.update()
+    return root
+
+
+def run_headless(sessions, draws):
+    import threading
+
+    from bench_suite import HeadlessCanvas, HeadlessImageCache, spread_images
+    import main
+    import tarot_reading
+    from reading_worker import reading_executor
+    from spreads import SPREADS
+
+    main.scaled_images = HeadlessImageCache()
+    canvases = [HeadlessCanvas(*CANVAS_SIZE) for _ in range(sessions)]
+    for _ in range(draws):
+        for session, canvas in enumerate(canvases):
+            for spread in SPREADS.values():
+                cards = tarot_reading.draw_cards(spread.num_cards)
+                canvas.images = spread_images(spread, cards)
+                main.redraw_spread(canvas, canvas.images, spread.layout)
+                reading_executor.submit(
+                    lambda is_current, cards=cards, spread=spread: tarot_reading.generate_tarot_reading(
+                        cards, "", spread
+                    ),
+                    session,
+                )
+    # A last job per session, which nothing supersedes, to wait for
+    done = [threading.Event() for _ in canvases]
+    for session, event in enumerate(done):
+        reading_executor.submit(lambda is_current, event=event: event.set(), session)
+    for event in done:
+        event.wait()
+    return canvases
+
+
+def station(sessions, draws):
+    # Runs in the child process: prints its memory, then stays alive until
+    # the parent closes stdin
+    os.environ["TAROT_FAKE_LLM"] = "1"
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(__file__))
+    import tarot_reading
+    from fake_llm import FakeGroq
+    from reading_cache import ReadingCache
+
+    tarot_reading.client = FakeGroq(chunk_delay=0, first_token_delay=0)
+    tarot_reading.groq_available = True
+    # Every station misses, as visitors ask their own questions
+    tarot_reading.reading_cache = ReadingCache(":memory:", max_entries=0)
+    tarot_reading.token_accountant.set_tokens_per_minute(None)
+    try:
+        # Not called, but a real client and its HTTP stack are part of what
+        # a station holds
+        from groq import Groq
+        real_client = Groq(api_key="benchmark")
+    except ImportError:
+        real_client = None
+    state = run_windows(sessions, draws) if has_display() else run_headless(sessions, draws)
+    gc.collect()
+    pss, rss = memory()
+    print(json.dumps({"sessions": sessions, "pss": pss, "rss": rss}), flush=True)
+    sys.stdin.read()
+    return state, real_client
+
+
+def measure(processes, sessions, draws):
+    # Total PSS and RSS of `processes` stations of `sessions` sessions each
+    children = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--station", str(sessions), "--draws", str(draws)],
+            cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        for _ in range(processes)
+    ]
+    reports = []
+    try:
+        for child in children:
+            line = child.stdout.readline()
+            if not line:
+                raise RuntimeError("a station exited before reporting its memory")
+            reports.append(json.loads(line))
+    finally:
+        for child in children:
+            child.stdin.close()
+            child.wait()
+    pss = [report["pss"] for report in reports]
+    return (sum(pss) if None not in pss else None), sum(report["rss"] for report in reports)
+
+
+def mib(value):
+    return "n/a" if value is None else f"{value / 2 ** 20:.1f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare N station processes with one kiosk of N sessions")
+    parser.add_argument("--stations", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--draws", type=int, default=3, help="draws of every spread per station")
+    parser.add_argument("--station", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.station is not None:
+        station(args.station, args.draws)
+        return
+
+    print(f"{'windows' if has_display() else 'headless'}, {args.draws} draws of every spread per station")
+    print(f"{'stations':>8}  {'processes PSS':>14}  {'kiosk PSS':>12}  {'processes RSS':>14}  {'kiosk RSS':>12}")
+    for count in args.stations:
+        processes_pss, processes_rss = measure(count, 1, args.draws)
+        kiosk_pss, kiosk_rss = measure(1, count, args.draws)
+        print(f"{count:>8}  {mib(processes_pss):>14}  {mib(kiosk_pss):>12}"
+              f"  {mib(processes_rss):>14}  {mib(kiosk_rss):>12}")
+
+
+if __name__ == "__main__":
+    main()
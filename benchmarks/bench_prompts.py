@@ -0,0 +1,30 @@
+# Micro-benchmark of prompt construction per registered spread.
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from spreads import SPREADS
+from deck import deck
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time Spread.build_prompt for every registered spread")
+    parser.add_argument("--number", type=int, default=20000, help="prompts built per timing run")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for spread in SPREADS.values():
+        cards = deck.cards[:spread.num_cards]
+        for query in ("", "Will the new job work out?"):
+            best = min(timeit.repeat(
+                lambda: spread.build_prompt(cards, query), number=args.number, repeat=args.repeat
+            ))
+            label = "with query" if query else "no query"
+            print(f"{spread.name:<10} {label:<11} {1e6 * best / args.number:7.2f} us/prompt")
+
+
+if __name__ == "__main__":
+    main()
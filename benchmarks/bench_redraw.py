@@ -0,0 +1,60 @@
+# Simulated resize storm against the Celtic Cross canvas.
+# Drives the window through many intermediate sizes, pumping the Tk event loop
+# between steps the way a window-edge drag does, then reports how many redraws
+# actually ran and how long each one took. Requires a display (or Xvfb).
+import argparse
+import os
+import sys
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import main
+
+
+def resize_storm(steps, step_delay):
+    root = tk.Tk()
+    root.geometry("1100x700")
+    main.setup_main_gui(root, spread_type="celtic")
+    root.update()
+    canvas = next(
+        widget
+        for widget in root.winfo_children()[0].winfo_children()[0].winfo_children()
+        if isinstance(widget, tk.Canvas)
+    )
+    scheduler = canvas.redraw_scheduler
+    scheduler.request_count = scheduler.redraw_count = 0
+    scheduler.redraw_seconds = 0.0
+
+    start = time.perf_counter()
+    for i in range(steps):
+        # Sweep back and forth between 700 and 1400 px wide
+        offset = i % 140
+        width = 700 + 5 * (offset if (i // 140) % 2 == 0 else 140 - offset)
+        root.geometry(f"{width}x{int(width * 0.6)}")
+        root.update()
+        time.sleep(step_delay)
+    scheduler.flush()
+    elapsed = time.perf_counter() - start
+    root.destroy()
+    return scheduler, elapsed
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark canvas redraws under a resize storm")
+    parser.add_argument("--steps", type=int, default=600)
+    parser.add_argument("--step-delay", type=float, default=0.002, help="seconds between resize events")
+    args = parser.parse_args()
+
+    scheduler, elapsed = resize_storm(args.steps, args.step_delay)
+    redraws = scheduler.redraw_count
+    print(f"resize events:      {scheduler.request_count}")
+    print(f"redraws:            {redraws}")
+    print(f"redraws per second: {redraws / elapsed:.1f}")
+    if redraws:
+        print(f"mean frame time:    {1000 * scheduler.redraw_seconds / redraws:.2f} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,87 @@
+# Load test for reading_server.py against the local fake LLM backend.
+# Starts the server in-process, then opens many keep-alive client connections
+# that each loop over /draw followed by /reading, and reports request
+# throughput and latency percentiles.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+os.environ["TAROT_FAKE_LLM"] = "1"
+
+import reading_server
+import tarot_reading
+from fake_llm import AsyncFakeGroq
+from spreads import SPREADS
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1")
+        + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client_session(port, iterations, spread, latencies, errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            status, drawn = await request(reader, writer, "GET", f"/draw?spread={spread}")
+            body = {"spread": spread, "cards": drawn["ids"], "reversed": drawn["reversed"], "query": ""}
+            status, reading = await request(reader, writer, "POST", "/reading", body)
+            if status != 200:
+                errors.append(reading)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def load_test(clients, iterations, spread, llm_latency):
+    tarot_reading.async_client = AsyncFakeGroq(first_token_delay=llm_latency)
+    # The mock LLM has no token limit to stay under
+    tarot_reading.token_accountant.set_tokens_per_minute(None)
+    server = await reading_server.ReadingServer(use_cache=False).start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(client_session(port, iterations, spread, latencies, errors) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+    return latencies, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the reading server against a mock LLM")
+    parser.add_argument("--clients", type=int, default=200, help="concurrent keep-alive connections")
+    parser.add_argument("--iterations", type=int, default=5, help="draw+reading round trips per client")
+    parser.add_argument("--spread", default="three", choices=sorted(SPREADS))
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds the mock LLM takes per reading")
+    args = parser.parse_args()
+
+    latencies, errors, elapsed = asyncio.run(load_test(args.clients, args.iterations, args.spread, args.llm_latency))
+    latencies.sort()
+    print(f"round trips:       {len(latencies)} ({len(errors)} errors)")
+    print(f"requests / second: {2 * len(latencies) / elapsed:.1f}")
+    print(f"p50 / p95 / max:   {latencies[len(latencies) // 2]:.3f}s / "
+          f"{latencies[int(len(latencies) * 0.95)]:.3f}s / {latencies[-1]:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
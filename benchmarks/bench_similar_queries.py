@@ -0,0 +1,145 @@
+# Near-duplicate question lookup at scale: fills a QueryIndex with synthetic
+# questions, then times lookups of paraphrases of stored questions (which
+# should match the question they came from) and of new questions (which
+# should not match anything).
+#
+# "cards" scopes every question to a random three-card draw, as the app does;
+# "crowded" piles the questions into a few scopes, so lookups go through the
+# word-signature buckets rather than a scan.
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from deck import deck
+from query_index import QueryIndex
+
+TEMPLATES = [
+    "will i {verb} the {noun}",
+    "should i {verb} my {noun} this year",
+    "what does the {noun} hold for my {other}",
+    "how will my {noun} and {other} turn out",
+    "is it time to {verb} the {noun}",
+    "what do i need to know about {noun} and {other}",
+]
+VERBS = ["get", "keep", "leave", "find", "change", "start", "finish", "accept", "sell", "trust"]
+WHEN = ["", " soon", " next month", " before summer", " after the holidays"]
+
+
+def drop_letter(question):
+    # A typo: one letter missing from the longest word
+    longest = max(question.split(), key=len)
+    return question.replace(longest, longest[:2] + longest[3:], 1)
+
+
+# Paraphrases a kiosk visitor might type for the same question
+EDITS = [
+    drop_letter,
+    lambda q: q + "?",
+    lambda q: q.replace(" the ", " this ", 1),
+    lambda q: q.capitalize() + " please",
+    lambda q: q.replace(" my ", " my own ", 1),
+    lambda q: "  " + q.upper() + "!!",
+]
+
+
+def vocabulary():
+    words = set()
+    for card in deck:
+        words.update(word for word in re.findall(r"[a-z]+", card.meaning.lower()) if len(word) > 3)
+    return sorted(words)
+
+
+def make_questions(count, rng):
+    nouns = vocabulary()
+    if count > len(TEMPLATES) * len(WHEN) * len(nouns) ** 2 // 4:
+        raise ValueError(f"too many questions for a vocabulary of {len(nouns)} words")
+    questions = set()
+    while len(questions) < count:
+        template = rng.choice(TEMPLATES) + rng.choice(WHEN)
+        questions.add(template.format(verb=rng.choice(VERBS), noun=rng.choice(nouns), other=rng.choice(nouns)))
+    return sorted(questions)
+
+
+def make_scopes(count, layout, rng):
+    if layout == "crowded":
+        return [("three", ("crowded", i)) for i in range(count)]
+    return None
+
+
+def random_scope(rng, scopes):
+    if scopes is not None:
+        return rng.choice(scopes)
+    cards = rng.sample(deck.cards, 3)
+    return ("three", tuple(deck.orient(card, rng.random() < 0.5).display_name for card in cards))
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(size, layout, scope_count, probes, rng, memory=False):
+    questions = make_questions(size + probes, rng)
+    stored, fresh = questions[:size], questions[size:]
+    scopes = make_scopes(scope_count, layout, rng)
+    index = QueryIndex()
+    placed = []
+    if memory:
+        # Tracing slows the build down several times over
+        tracemalloc.start()
+    start = time.perf_counter()
+    for question in stored:
+        scope = random_scope(rng, scopes)
+        index.add(scope, question)
+        placed.append((scope, question))
+    build = time.perf_counter() - start
+    if memory:
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    hit_times, found = [], 0
+    for scope, question in rng.sample(placed, probes):
+        paraphrase = rng.choice(EDITS)(question)
+        start = time.perf_counter()
+        match = index.find(scope, paraphrase)
+        hit_times.append(time.perf_counter() - start)
+        found += match is not None and match[0] == question
+    miss_times, false_matches = [], 0
+    for question in fresh[:probes]:
+        scope = rng.choice(placed)[0]
+        start = time.perf_counter()
+        match = index.find(scope, question)
+        miss_times.append(time.perf_counter() - start)
+        false_matches += match is not None
+
+    print(f"{size} questions, {layout} scopes: built in {build:.2f}s"
+          + (f", {used / 2 ** 20:.1f} MiB with the scopes and questions" if memory else ""))
+    for label, samples in (("paraphrase", hit_times), ("new question", miss_times)):
+        print(f"  {label:<13} median {1e6 * statistics.median(samples):7.1f} us"
+              f"   p99 {1e6 * percentile(samples, 0.99):7.1f} us")
+    print(f"  paraphrases matched {found}/{probes}, new questions matched {false_matches}/{probes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate question lookups")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--scopes", type=int, default=10, help="number of scopes for the crowded layout")
+    parser.add_argument("--probes", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--memory", action="store_true", help="also measure the memory the index holds")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        for layout in ("cards", "crowded"):
+            run(size, layout, args.scopes, args.probes, random.Random(args.seed), args.memory)
+
+
+if __name__ == "__main__":
+    main()
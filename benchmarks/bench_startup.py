@@ -0,0 +1,87 @@
+# Startup benchmark: import cost of main.py and time to first paint.
+#
+# Runs `python -X importtime -c "import main"` in a fresh interpreter and
+# lists the slowest imports, then (when a display is available) launches the
+# app with TAROT_STARTUP_PROBE set so it reports when the window is first
+# drawn and exits. Results are appended to a JSONL history file together
+# with the current git revision so startup can be tracked across releases.
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+HISTORY_FILE = os.path.join(os.path.dirname(__file__), "startup_history.jsonl")
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_times():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return cumulative
+
+
+def first_paint():
+    result = subprocess.run(
+        [sys.executable, "main.py"],
+        cwd=ROOT, capture_output=True, text=True, timeout=60,
+        env={**os.environ, "TAROT_STARTUP_PROBE": repr(time.time())},
+    )
+    match = re.search(r"first paint: ([\d.]+)s", result.stdout)
+    return float(match.group(1)) if match else None
+
+
+def git_revision():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to first paint")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to average over")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--no-history", action="store_true", help="do not append to the history file")
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+    main_import_ms = sum(run["main"] for run in runs) / len(runs) / 1000
+    print(f"import main: {main_import_ms:.1f} ms (mean of {args.runs})")
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)
+    for module, microseconds in slowest[1:args.top + 1]:
+        print(f"  {microseconds / 1000:8.1f} ms  {module}")
+    for heavy in ("groq", "PIL", "numpy", "asyncio"):
+        if heavy in runs[-1]:
+            print(f"warning: {heavy} is imported at startup")
+
+    paints = []
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        paints = [paint for paint in (first_paint() for _ in range(args.runs)) if paint is not None]
+    if paints:
+        print(f"time to first paint: {1000 * sum(paints) / len(paints):.1f} ms (mean of {len(paints)})")
+    else:
+        print("time to first paint: skipped (no display)")
+
+    if not args.no_history:
+        with open(HISTORY_FILE, "a", encoding="utf-8") as history:
+            history.write(json.dumps({
+                "revision": git_revision(),
+                "timestamp": time.time(),
+                "import_main_ms": round(main_import_ms, 2),
+                "first_paint_ms": round(1000 * sum(paints) / len(paints), 2) if paints else None,
+            }) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# Headless benchmark suite for the hot paths of a reading.
+#
+# Times draw_cards, prompt building, the layout engine and redraws (layout
+# plus LANCZOS resampling) of every spread at several canvas sizes, and whole
+# spreads (draw, layout and reading) against the fake LLM client. Nothing
+# needs a display: redraws run against a stand-in canvas, and the scaled image
+# cache hands back plain PIL images instead of PhotoImages.
+#
+# Results are written as JSON. Pass --baseline to compare with an earlier run;
+# the exit status is 1 when any benchmark is slower than its baseline by more
+# than --threshold, so the suite can gate CI:
+#
+#   python benchmarks/bench_suite.py --save-baseline benchmarks/baseline.json
+#   python benchmarks/bench_suite.py --baseline benchmarks/baseline.json --threshold 0.15
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+import layout
+import main
+import tarot_reading
+from deck import deck
+from deck_assets import deck_assets
+from fake_llm import FakeGroq
+from image_cache import ScaledImageCache
+from reading_cache import ReadingCache
+from spreads import SPREADS
+
+CANVAS_SIZES = [(640, 480), (1280, 800), (1920, 1080), (3840, 2160)]
+# Canvas size used for the full spread benchmarks
+SPREAD_CANVAS_SIZE = (1280, 800)
+QUERY = "Will the new job work out?"
+
+
+class HeadlessPhoto:
+    # Stands in for ImageTk.PhotoImage: only its size is used by the layouts
+    def __init__(self, image):
+        self.image = image
+
+    def width(self):
+        return self.image.width
+
+    def height(self):
+        return self.image.height
+
+
+class HeadlessImageCache(ScaledImageCache):
+    def make_photo(self, image):
+        return HeadlessPhoto(image)
+
+
+class HeadlessCanvas:
+    # The parts of tk.Canvas that redraw_spread uses
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.item_count = 0
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def create_image(self, x, y, image=None, anchor=None):
+        self.item_count += 1
+        return self.item_count
+
+    def coords(self, item, x, y):
+        pass
+
+    def itemconfig(self, item, image=None):
+        pass
+
+
+def spread_images(spread, cards):
+    return [
+        (card.image, deck_assets.get(card.image), rotation)
+        for card, rotation in zip(cards, spread.card_rotations(cards))
+    ]
+
+
+def redraw_benchmark(spread, size, cold, reversed_cards=False):
+    # cold: every redraw resamples all cards (a resize to a new size)
+    # warm: every redraw is served from the scaled image cache
+    cards = deck.cards[:spread.num_cards]
+    if reversed_cards:
+        cards = [deck.orient(card, True) for card in cards]
+    images = spread_images(spread, cards)
+    canvas = HeadlessCanvas(*size)
+    if cold:
+        def run():
+            main.scaled_images.clear()
+            main.redraw_spread(canvas, images, spread.layout)
+    else:
+        main.redraw_spread(canvas, images, spread.layout)
+        def run():
+            main.redraw_spread(canvas, images, spread.layout)
+    return run
+
+
+def layout_benchmark(spread, size, cached):
+    card_size = deck_assets.card_size()
+    if cached:
+        return lambda: layout.spread_layout(spread, *size, card_size)
+    compute = layout.LAYOUTS[spread.layout]
+    return lambda: compute(*size, *card_size, spread.rotation_list)
+
+
+def full_spread_benchmark(spread, stream):
+    # What a click on a spread button costs, minus Tk: draw, decode, layout,
+    # card meanings and the reading from a fake client that answers at once
+    canvas = HeadlessCanvas(*SPREAD_CANVAS_SIZE)
+    calls = 0
+
+    def run():
+        nonlocal calls
+        calls += 1
+        cards = tarot_reading.draw_cards(spread.num_cards)
+        main.redraw_spread(canvas, spread_images(spread, cards), spread.layout)
+        spread.card_meanings(cards)
+        # A new query every call so the reading cache always misses
+        query = f"{QUERY} #{calls}"
+        if stream:
+            for _ in tarot_reading.stream_tarot_reading(cards, query, spread):
+                pass
+        else:
+            tarot_reading.generate_tarot_reading(cards, query, spread)
+    return run
+
+
+def benchmarks():
+    # (name, callable, calls per timing run)
+    yield "draw_cards/3", lambda: tarot_reading.draw_cards(3), 20000
+    yield "draw_cards/10", lambda: tarot_reading.draw_cards(10), 20000
+    for spread in SPREADS.values():
+        cards = deck.cards[:spread.num_cards]
+        yield f"prompt/{spread.name}", lambda cards=cards, spread=spread: tarot_reading.build_tarot_prompt(cards, QUERY, spread), 20000
+    for spread in SPREADS.values():
+        for width, height in CANVAS_SIZES:
+            yield f"layout/{spread.name}/{width}x{height}", layout_benchmark(spread, (width, height), False), 20000
+        yield f"layout/{spread.name}/cached", layout_benchmark(spread, CANVAS_SIZES[0], True), 20000
+    for spread in SPREADS.values():
+        for width, height in CANVAS_SIZES:
+            yield f"redraw/{spread.name}/{width}x{height}/cold", redraw_benchmark(spread, (width, height), True), 5
+            yield f"redraw/{spread.name}/{width}x{height}/warm", redraw_benchmark(spread, (width, height), False), 2000
+        # Should match the upright warm redraw at the same size
+        yield f"redraw/{spread.name}/1280x800/reversed/warm", redraw_benchmark(spread, (1280, 800), False, True), 2000
+    for spread in SPREADS.values():
+        yield f"spread/{spread.name}/blocking", full_spread_benchmark(spread, False), 20
+        yield f"spread/{spread.name}/stream", full_spread_benchmark(spread, True), 20
+
+
+def use_headless_backends():
+    main.scaled_images = HeadlessImageCache()
+    tarot_reading.client = FakeGroq(chunk_size=64, chunk_delay=0, first_token_delay=0)
+    tarot_reading.groq_available = True
+    tarot_reading.reading_cache = ReadingCache(":memory:")
+    # The fake client has no token limit to stay under
+    tarot_reading.token_accountant.set_tokens_per_minute(None)
+    deck_assets.load_all()
+
+
+def run_benchmarks(only, repeat, scale):
+    results = {}
+    for name, function, number in benchmarks():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        number = max(int(number * scale), 1)
+        # Seconds per call of each timing run
+        runs = [total / number for total in timeit.repeat(function, number=number, repeat=repeat)]
+        results[name] = {
+            "best_us": 1e6 * min(runs),
+            "median_us": 1e6 * statistics.median(runs),
+            "number": number,
+            "repeat": repeat,
+        }
+        print(f"{name:<40} {results[name]['best_us']:12.2f} us  (median {results[name]['median_us']:.2f})")
+    return results
+
+
+def git_revision():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def compare(results, baseline, threshold):
+    # Returns the names of benchmarks whose best time regressed past the threshold
+    regressions = []
+    print(f"\nCompared with baseline {baseline.get('revision') or '?'} (threshold {threshold:.0%}):")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<40} {'new':>12}")
+            continue
+        change = result["best_us"] / before["best_us"] - 1
+        marker = ""
+        if change > threshold:
+            regressions.append(name)
+            marker = "  REGRESSION"
+        print(f"{name:<40} {change:+12.1%}{marker}")
+    return regressions
+
+
+def write_json(path, payload):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+        f.write("\n")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Run the headless benchmark suite")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(__file__), "results.json"),
+                        help="where to write the results as JSON")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--save-baseline", help="also write the results to this file")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument("--only", action="append", help="run only benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per benchmark")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the calls per timing run")
+    args = parser.parse_args()
+
+    use_headless_backends()
+    results = run_benchmarks(args.only, args.repeat, args.scale)
+    payload = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    write_json(args.output, payload)
+    if args.save_baseline:
+        write_json(args.save_baseline, payload)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
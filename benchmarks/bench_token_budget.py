@@ -0,0 +1,138 @@
+# Concurrent readings against the token budget.
+#
+# Simulates Celtic Cross readings under the default tokens-per-minute
+# budget: each reserves the prompt estimate plus the ten-card prior
+# max_tokens, holds it while the "completion" runs, then settles at the
+# tokens it actually used. Readings should be deferred until the budget has
+# room, in the order they asked, and none should fail. Threads stand in for
+# the app's reading workers; tasks on one event loop for the server and the
+# batch reader.
+#
+# Time runs --speedup times faster (the budget's refill period, reading
+# durations and the wait limit alike), so the run takes seconds rather than
+# minutes with the same dynamics. The exit status is 1 if any reading failed.
+#
+#   python benchmarks/bench_token_budget.py --threads 12 --tasks 4
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from llm_transport import ReadingError
+import token_accounting
+from token_accounting import TokenBudget
+
+# A Celtic Cross prompt is about this many tokens
+PROMPT_TOKENS = 250
+CARDS = 10
+# What one reading actually takes, and for how long
+USED_TOKENS = 1200
+READING_SECONDS = 2.0
+
+
+class Scenario:
+    def __init__(self, speedup):
+        self.speedup = speedup
+        self.budget = TokenBudget(token_accounting.TOKENS_PER_MINUTE, period=60 / speedup)
+        self.max_wait = token_accounting.MAX_BUDGET_WAIT / speedup
+        prior = token_accounting.PRIOR_BASE_TOKENS + token_accounting.PRIOR_TOKENS_PER_CARD * CARDS
+        self.reserve = PROMPT_TOKENS + prior
+        self.used = USED_TOKENS
+        self.duration = READING_SECONDS / speedup
+        self.waits = []
+        self.grants = []
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def record(self, number, start, error):
+        with self._lock:
+            if error is not None:
+                self.failures += 1
+                print(f"  reading {number} failed after {(time.monotonic() - start) * self.speedup:.1f}s: {error}")
+                return
+            self.waits.append((time.monotonic() - start) * self.speedup)
+            self.grants.append(number)
+
+    def reading(self, number):
+        start = time.monotonic()
+        try:
+            reserved = self.budget.acquire(self.reserve, self.max_wait)
+        except ReadingError as e:
+            self.record(number, start, e.message)
+            return
+        self.record(number, start, None)
+        time.sleep(self.duration)
+        self.budget.refund(reserved - self.used)
+
+    async def reading_async(self, number):
+        start = time.monotonic()
+        try:
+            reserved = await self.budget.acquire_async(self.reserve, self.max_wait)
+        except ReadingError as e:
+            self.record(number, start, e.message)
+            return
+        self.record(number, start, None)
+        await asyncio.sleep(self.duration)
+        self.budget.refund(reserved - self.used)
+
+    def report(self, label, count):
+        in_order = self.grants == sorted(self.grants)
+        waits = self.waits or [0.0]
+        print(f"{label}: {count - self.failures}/{count} readings ok,"
+              f" wait median {statistics.median(waits):.1f}s max {max(waits):.1f}s (unscaled),"
+              f" {'in' if in_order else 'out of'} order")
+
+
+def run_threads(concurrency, speedup):
+    scenario = Scenario(speedup)
+    threads = []
+    for number in range(concurrency):
+        thread = threading.Thread(target=scenario.reading, args=(number,))
+        thread.start()
+        threads.append(thread)
+        # Asking in a known order, so the grant order can be checked
+        time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    scenario.report(f"{concurrency} threads", concurrency)
+    return scenario.failures
+
+
+def run_tasks(concurrency, readings, speedup):
+    # Like batch_reader: `concurrency` readings in flight until all are done
+    scenario = Scenario(speedup)
+
+    async def batch():
+        slots = asyncio.Semaphore(concurrency)
+
+        async def run(number):
+            async with slots:
+                await scenario.reading_async(number)
+
+        await asyncio.gather(*(run(number) for number in range(readings)))
+
+    asyncio.run(batch())
+    scenario.report(f"{readings} readings, {concurrency} tasks", readings)
+    return scenario.failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the token budget defers readings instead of failing them")
+    parser.add_argument("--threads", type=int, default=12, help="concurrent readings on threads")
+    parser.add_argument("--tasks", type=int, default=4, help="concurrent readings on the event loop")
+    parser.add_argument("--readings", type=int, default=10, help="readings for the event loop run")
+    parser.add_argument("--speedup", type=float, default=20)
+    args = parser.parse_args()
+
+    failures = run_threads(args.threads, args.speedup)
+    failures += run_tasks(args.tasks, args.readings, args.speedup)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
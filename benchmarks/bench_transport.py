@@ -0,0 +1,91 @@
+# Soak test of the LLM transport against fake_llm_server.py.
+# Starts the fault-injecting fake backend on a background thread, points a
+# real groq client at it and runs readings through LLMTransport from several
+# threads, then reports how each request ended, how many retries were made,
+# how often the circuit breaker opened and the latency distribution.
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from deck import deck
+from fake_llm_server import FakeLLMServer, FaultConfig
+from llm_transport import CircuitBreaker, LLMTransport, ReadingError
+from tarot_reading import build_tarot_prompt, completion_params
+
+
+def start_backend(faults):
+    ready = threading.Event()
+    state = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        state["server"] = server = FakeLLMServer(faults)
+        state["listener"] = loop.run_until_complete(server.start("127.0.0.1", 0))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return state["server"], state["listener"].sockets[0].getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run readings through the transport against a faulty backend")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--rate-limit", type=float, default=0.2)
+    parser.add_argument("--server-error", type=float, default=0.1)
+    parser.add_argument("--hang", type=float, default=0.05)
+    parser.add_argument("--drop-stream", type=float, default=0.05)
+    parser.add_argument("--attempt-timeout", type=float, default=1.0)
+    parser.add_argument("--deadline", type=float, default=5.0)
+    args = parser.parse_args()
+
+    try:
+        from groq import Groq
+    except ImportError:
+        sys.exit("groq is not installed; this benchmark drives the real client against the fake backend")
+
+    faults = FaultConfig(args.rate_limit, args.server_error, args.hang, args.drop_stream,
+                         hang_seconds=args.attempt_timeout * 3, latency=0.05, retry_after=0.2)
+    server, port = start_backend(faults)
+    client = Groq(api_key="fake", base_url=f"http://127.0.0.1:{port}", max_retries=0)
+    transport = LLMTransport(lambda: client, attempt_timeout=args.attempt_timeout, deadline=args.deadline,
+                             breaker=CircuitBreaker(failure_threshold=5, cooldown=1.0))
+    params = completion_params(build_tarot_prompt(deck.cards[:3], ""))
+
+    def one_request(_):
+        start = time.perf_counter()
+        try:
+            if args.stream:
+                "".join(chunk.choices[0].delta.content or "" for chunk in transport.stream(params))
+            else:
+                transport.complete(params)
+            outcome = "ok"
+        except ReadingError as e:
+            outcome = e.kind
+        return outcome, time.perf_counter() - start
+
+    with ThreadPoolExecutor(args.threads) as pool:
+        results = list(pool.map(one_request, range(args.requests)))
+
+    outcomes = Counter(outcome for outcome, _ in results)
+    latencies = sorted(latency for _, latency in results)
+    print(f"outcomes:        {dict(outcomes)}")
+    print(f"backend saw:     {server.counts}")
+    print(f"retries:         {transport.retries}")
+    print(f"breaker opened:  {transport.breaker.times_opened} times")
+    print(f"latency p50/p95/max: {latencies[len(latencies) // 2]:.2f}s / "
+          f"{latencies[int(len(latencies) * 0.95)]:.2f}s / {latencies[-1]:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# The tarot deck as immutable card records with integer ids.
+#
+# A card's id is its position in tarot_deck, the same index deck_sampler
+# draws, so a draw can travel as a short list (or array) of ints and be turned
+# back into cards with deck.from_ids(). Lookups by name, image, suit and
+# arcana are dict or tuple indexes built once at import.
+#
+# Every card also has a reversed twin with the same id, made once here, so
+# drawing a reversed card allocates nothing.
+from collections import namedtuple
+import re
+import sys
+
+from tarot_deck import tarot_deck
+
+MAJOR = "major"
+MINOR = "minor"
+# Minor arcana images are named <Suit><rank>.gif, e.g. Wands01.gif
+_MINOR_IMAGE = re.compile(r"([A-Za-z]+)(\d+)\.gif")
+
+
+class Card(namedtuple("Card", "id name meaning image arcana suit rank reversed display_name")):
+    # suit is None for the major arcana; rank is 1-14 within a suit
+    # (11-14 being page, knight, queen and king), or 0-21 for the majors.
+    # display_name is the name with " (reversed)" added for reversed cards.
+    __slots__ = ()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "meaning": self.meaning,
+            "image": self.image,
+            "reversed": self.reversed,
+        }
+
+
+class Deck:
+    def __init__(self, records):
+        cards = []
+        major_rank = 0
+        for card_id, record in enumerate(records):
+            match = _MINOR_IMAGE.fullmatch(record["image"])
+            if match:
+                arcana, suit, rank = MINOR, sys.intern(match.group(1)), int(match.group(2))
+            else:
+                arcana, suit, rank = MAJOR, None, major_rank
+                major_rank += 1
+            cards.append(Card(
+                card_id,
+                sys.intern(record["name"]),
+                record["meaning"],
+                sys.intern(record["image"]),
+                arcana,
+                suit,
+                rank,
+                False,
+                sys.intern(record["name"]),
+            ))
+        self.cards = tuple(cards)
+        self.reversed_cards = tuple(
+            card._replace(reversed=True, display_name=f"{card.name} (reversed)") for card in self.cards
+        )
+        self.by_name = {card.name: card for card in self.cards}
+        self.by_image = {card.image: card for card in self.cards}
+        self.by_suit = {}
+        self.by_arcana = {MAJOR: [], MINOR: []}
+        for card in self.cards:
+            self.by_arcana[card.arcana].append(card)
+            if card.suit is not None:
+                self.by_suit.setdefault(card.suit, []).append(card)
+        self.by_suit = {suit: tuple(cards) for suit, cards in self.by_suit.items()}
+        self.by_arcana = {arcana: tuple(cards) for arcana, cards in self.by_arcana.items()}
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def __getitem__(self, card_id):
+        return self.cards[card_id]
+
+    def from_ids(self, card_ids, reversed_flags=None):
+        # Accepts any sequence of ints, including a row of a numpy draw array
+        if reversed_flags is None:
+            cards = self.cards
+            return [cards[card_id] for card_id in card_ids]
+        return [self.orient(self.cards[card_id], flag) for card_id, flag in zip(card_ids, reversed_flags)]
+
+    def orient(self, card, reversed_card):
+        # The upright or reversed record of the same card
+        return (self.reversed_cards if reversed_card else self.cards)[card.id]
+
+    @staticmethod
+    def ids(cards):
+        return [card.id for card in cards]
+
+
+deck = Deck(tarot_deck)
@@ -0,0 +1,75 @@
+import os
+import struct
+import threading
+
+import metrics
+from deck import deck
+
+ASSET_DIR = os.path.dirname(__file__)
+PLACEHOLDER_IMAGE = "Back.gif"
+
+
+class DeckAssets:
+    # Decoded card images, loaded once and then served from memory.
+    # GIFs stay in their palette ("P") mode, one byte per pixel, which keeps
+    # the whole deck at a few MB.
+
+    def __init__(self, image_names, asset_dir=ASSET_DIR):
+        self.image_names = list(image_names)
+        self.asset_dir = asset_dir
+        self._images = {}
+        self._lock = threading.Lock()
+        self._loader = None
+
+    def _decode(self, image_name):
+        # PIL is imported on first decode so it stays off the startup path
+        from PIL import Image
+        with metrics.span("image_decode"):
+            with Image.open(os.path.join(self.asset_dir, image_name)) as pil_image:
+                pil_image.load()
+                return pil_image.copy()
+
+    def get(self, image_name):
+        pil_image = self._images.get(image_name)
+        if pil_image is not None:
+            return pil_image
+        # Not loaded yet (or the background load has not reached it): decode
+        # it now, the background loader will skip it later
+        pil_image = self._decode(image_name)
+        with self._lock:
+            return self._images.setdefault(image_name, pil_image)
+
+    def card_size(self):
+        # Read from the GIF header so sizing the window does not need a decode
+        image_name = self.image_names[0]
+        if image_name not in self._images:
+            with open(os.path.join(self.asset_dir, image_name), "rb") as f:
+                header = f.read(10)
+            if header[:3] == b"GIF":
+                return struct.unpack("<HH", header[6:10])
+        return self.get(image_name).size
+
+    def load_all(self):
+        for image_name in self.image_names:
+            if image_name not in self._images:
+                try:
+                    self.get(image_name)
+                except OSError as e:
+                    print(f"Error loading card image {image_name}: {e}")
+
+    def load_in_background(self):
+        if self._loader is None:
+            self._loader = threading.Thread(target=self.load_all, daemon=True)
+            self._loader.start()
+        return self._loader
+
+    def loaded_bytes(self):
+        return sum(
+            len(pil_image.getbands()) * pil_image.width * pil_image.height
+            for pil_image in list(self._images.values())
+        )
+
+
+deck_assets = DeckAssets(
+    [card.image for card in deck] + [PLACEHOLDER_IMAGE]
+)
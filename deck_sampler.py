@@ -0,0 +1,167 @@
+# Vectorized card sampling and draw statistics.
+#
+# Cards are their integer ids in the deck (see deck.py), so a batch of N draws of k cards
+# is a single (N, k) array. Used for fairness checks and co-occurrence
+# statistics over millions of simulated draws:
+#
+#   python deck_sampler.py --draws 1000000 --cards 3 --seed 42
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+
+from deck import deck
+
+DECK_SIZE = len(deck)
+# Rows sampled per block, which bounds the (rows, DECK_SIZE) scratch arrays
+BLOCK_ROWS = 65536
+
+
+class DeckSampler:
+    # Draws without replacement by giving every card a random key and taking
+    # the k smallest keys of each row.
+    #
+    # secure=False uses numpy's seedable PCG64 generator (fast, reproducible).
+    # secure=True takes the keys from os.urandom, the same source as
+    # random.SystemRandom used by draw_cards.
+
+    def __init__(self, deck_size=DECK_SIZE, seed=None, secure=False):
+        if secure and seed is not None:
+            raise ValueError("a seed cannot be used with secure sampling")
+        self.deck_size = deck_size
+        self.secure = secure
+        self._rng = None if secure else np.random.default_rng(seed)
+        self.index_dtype = np.uint8 if deck_size <= 256 else np.uint16
+
+    def _keys(self, rows):
+        if self.secure:
+            raw = os.urandom(rows * self.deck_size * 8)
+            return np.frombuffer(raw, dtype=np.uint64).reshape(rows, self.deck_size)
+        return self._rng.random((rows, self.deck_size))
+
+    def _draw_block(self, rows, k):
+        keys = self._keys(rows)
+        if k < self.deck_size:
+            chosen = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        else:
+            chosen = np.broadcast_to(np.arange(self.deck_size), (rows, self.deck_size))
+        # argpartition leaves the chosen cards in no particular order; sort
+        # them by their keys so the card order is random too
+        chosen_keys = np.take_along_axis(keys, chosen, axis=1)
+        order = np.argsort(chosen_keys, axis=1)
+        return np.take_along_axis(chosen, order, axis=1).astype(self.index_dtype)
+
+    def draw_batch(self, n, k):
+        if not 1 <= k <= self.deck_size:
+            raise ValueError(f"k must be between 1 and {self.deck_size}, got {k}")
+        draws = np.empty((n, k), dtype=self.index_dtype)
+        for start in range(0, n, BLOCK_ROWS):
+            rows = min(BLOCK_ROWS, n - start)
+            draws[start:start + rows] = self._draw_block(rows, k)
+        return draws
+
+    def draw(self, k):
+        return self.draw_batch(1, k)[0]
+
+
+def card_frequencies(draws, deck_size=DECK_SIZE):
+    return np.bincount(draws.ravel(), minlength=deck_size)
+
+
+def position_frequencies(draws, deck_size=DECK_SIZE):
+    # (k, deck_size) counts of each card at each position
+    k = draws.shape[1]
+    codes = draws.astype(np.int64) + np.arange(k) * deck_size
+    return np.bincount(codes.ravel(), minlength=k * deck_size).reshape(k, deck_size)
+
+
+def pair_counts(draws, deck_size=DECK_SIZE):
+    # Symmetric (deck_size, deck_size) matrix of how often two cards were
+    # drawn together in the same spread, regardless of position
+    k = draws.shape[1]
+    counts = np.zeros(deck_size * deck_size, dtype=np.int64)
+    if k < 2:
+        return counts.reshape(deck_size, deck_size)
+    first, second = np.triu_indices(k, 1)
+    wide = draws.astype(np.int64)
+    for start in range(0, len(wide), BLOCK_ROWS):
+        block = wide[start:start + BLOCK_ROWS]
+        codes = block[:, first] * deck_size + block[:, second]
+        counts += np.bincount(codes.ravel(), minlength=deck_size * deck_size)
+    counts = counts.reshape(deck_size, deck_size)
+    return counts + counts.T
+
+
+def chi_square_sf(statistic, dof):
+    # Upper tail probability of the chi-square distribution. Uses scipy when
+    # it is installed, otherwise the Wilson-Hilferty normal approximation,
+    # which is accurate to a few decimal places for dof above ~30
+    try:
+        from scipy.stats import chi2
+        return float(chi2.sf(statistic, dof))
+    except ImportError:
+        z = ((statistic / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+        return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def chi_square(observed):
+    observed = np.asarray(observed, dtype=np.float64).ravel()
+    expected = observed.sum() / len(observed)
+    statistic = float(((observed - expected) ** 2 / expected).sum())
+    dof = len(observed) - 1
+    return statistic, dof, chi_square_sf(statistic, dof)
+
+
+def fairness_report(draws, deck_size=DECK_SIZE):
+    frequencies = card_frequencies(draws, deck_size)
+    statistic, dof, p_value = chi_square(frequencies)
+    report = {
+        "draws": int(draws.shape[0]),
+        "cards_per_draw": int(draws.shape[1]),
+        "card_chi_square": statistic,
+        "card_dof": dof,
+        "card_p_value": p_value,
+        "min_card_count": int(frequencies.min()),
+        "max_card_count": int(frequencies.max()),
+        "positions": [],
+    }
+    for position, counts in enumerate(position_frequencies(draws, deck_size), 1):
+        statistic, dof, p_value = chi_square(counts)
+        report["positions"].append({"position": position, "chi_square": statistic, "p_value": p_value})
+    if draws.shape[1] > 1:
+        pairs = pair_counts(draws, deck_size)
+        upper = pairs[np.triu_indices(deck_size, 1)]
+        statistic, dof, p_value = chi_square(upper)
+        report.update(pair_chi_square=statistic, pair_dof=dof, pair_p_value=p_value)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate draws and report fairness statistics")
+    parser.add_argument("--draws", type=int, default=1_000_000)
+    parser.add_argument("--cards", type=int, default=3, help="cards per draw")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--secure", action="store_true", help="use os.urandom instead of the seeded generator")
+    args = parser.parse_args()
+
+    sampler = DeckSampler(seed=args.seed, secure=args.secure)
+    start = time.perf_counter()
+    draws = sampler.draw_batch(args.draws, args.cards)
+    elapsed = time.perf_counter() - start
+    print(f"sampled {args.draws} draws of {args.cards} cards in {elapsed:.2f}s "
+          f"({args.draws / elapsed:,.0f} draws/s)")
+
+    report = fairness_report(draws)
+    print(f"card frequencies: chi2={report['card_chi_square']:.1f} dof={report['card_dof']} "
+          f"p={report['card_p_value']:.4f} (counts {report['min_card_count']}..{report['max_card_count']})")
+    for position in report["positions"]:
+        print(f"  position {position['position']:>2}: chi2={position['chi_square']:.1f} p={position['p_value']:.4f}")
+    if "pair_chi_square" in report:
+        print(f"pair co-occurrence: chi2={report['pair_chi_square']:.1f} dof={report['pair_dof']} "
+              f"p={report['pair_p_value']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
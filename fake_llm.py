@@ -0,0 +1,103 @@
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+# Offline stand-in for the Groq client. It exposes the same
+# client.chat.completions.create(...) call and returns canned text, either as
+# a whole completion or as a stream of small chunks, so readings (including
+# streaming) can be exercised without an API key or network access.
+
+CANNED_READING = (
+    "The cards speak of a turning point. What has been held back is ready to move, "
+    "and the energy around the question favours patience over force. "
+    "Each card adds a layer: the first sets the tone, the next ones show where effort "
+    "is best spent, and together they point toward steady, deliberate progress."
+)
+
+
+class FakeRateLimitError(Exception):
+    # Shaped like groq.RateLimitError: a 429 status and a retry-after header
+    status_code = 429
+
+    def __init__(self, retry_after=0.1):
+        super().__init__("Rate limit reached (fake)")
+        self.response = SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+class _FakeCompletions:
+    def __init__(self, reading, chunk_size, chunk_delay, first_token_delay, rate_limit_rate):
+        self.reading = reading
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.first_token_delay = first_token_delay
+        # Fraction of calls that fail with a 429 before producing anything
+        self.rate_limit_rate = rate_limit_rate
+        self.calls = 0
+
+    def _check_rate_limit(self):
+        self.calls += 1
+        if self.rate_limit_rate and random.random() < self.rate_limit_rate:
+            raise FakeRateLimitError()
+
+    def _completion(self, messages):
+        message = SimpleNamespace(role="assistant", content=self.reading)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message, finish_reason="stop")],
+            usage=SimpleNamespace(
+                prompt_tokens=sum(len(m["content"].split()) for m in messages),
+                completion_tokens=len(self.reading.split()),
+            ),
+        )
+
+    def _chunks(self):
+        for start in range(0, len(self.reading), self.chunk_size):
+            delta = SimpleNamespace(content=self.reading[start:start + self.chunk_size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+        delta = SimpleNamespace(content=None)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason="stop")])
+
+    def create(self, messages, model=None, max_tokens=None, temperature=None, stream=False, **kwargs):
+        self._check_rate_limit()
+        if not stream:
+            time.sleep(self.first_token_delay)
+            return self._completion(messages)
+        return self._stream()
+
+    def _stream(self):
+        time.sleep(self.first_token_delay)
+        for chunk in self._chunks():
+            yield chunk
+            time.sleep(self.chunk_delay)
+
+
+class _AsyncFakeCompletions(_FakeCompletions):
+    async def create(self, messages, model=None, max_tokens=None, temperature=None, stream=False, **kwargs):
+        self._check_rate_limit()
+        if not stream:
+            await asyncio.sleep(self.first_token_delay)
+            return self._completion(messages)
+        return self._stream()
+
+    async def _stream(self):
+        await asyncio.sleep(self.first_token_delay)
+        for chunk in self._chunks():
+            yield chunk
+            await asyncio.sleep(self.chunk_delay)
+
+
+class FakeGroq:
+    completions_class = _FakeCompletions
+
+    def __init__(self, reading=CANNED_READING, chunk_size=8, chunk_delay=0.02, first_token_delay=0.3,
+                 rate_limit_rate=0.0):
+        self.chat = SimpleNamespace(
+            completions=self.completions_class(
+                reading, chunk_size, chunk_delay, first_token_delay, rate_limit_rate
+            )
+        )
+
+
+class AsyncFakeGroq(FakeGroq):
+    # Same as FakeGroq, but create() is a coroutine like groq.AsyncGroq
+    completions_class = _AsyncFakeCompletions
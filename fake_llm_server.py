@@ -0,0 +1,186 @@
+# Local fault-injecting stand-in for the Groq HTTP API.
+#
+# Serves POST /openai/v1/chat/completions in the OpenAI-compatible format the
+# groq SDK expects, both as plain JSON and as a server-sent event stream, and
+# fails a configurable share of requests on purpose: 429s with retry-after
+# headers, 503s, requests that hang past the client's timeout, and streams
+# that are cut off half way. Point the app at it with
+#
+#   python fake_llm_server.py --port 8765 --rate-limit 0.2 --hang 0.05
+#   TAROT_LLM_BASE_URL=http://127.0.0.1:8765 python main.py
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fake_llm import CANNED_READING
+from reading_server import HTTPError, read_request, response_head, send_json
+
+HOST = "127.0.0.1"
+PORT = 8765
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+
+class FaultConfig:
+    def __init__(self, rate_limit=0.0, server_error=0.0, hang=0.0, drop_stream=0.0,
+                 hang_seconds=120.0, latency=0.2, retry_after=1.0):
+        # Probabilities, checked in this order for every request
+        self.rate_limit = rate_limit
+        self.server_error = server_error
+        self.hang = hang
+        self.drop_stream = drop_stream
+        self.hang_seconds = hang_seconds
+        # Normal time to the first byte of a successful response
+        self.latency = latency
+        self.retry_after = retry_after
+
+
+class FakeLLMServer:
+    def __init__(self, faults=None, reading=CANNED_READING, chunk_size=8, chunk_delay=0.01):
+        self.faults = faults or FaultConfig()
+        self.reading = reading
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "server_error": 0, "hung": 0, "dropped": 0}
+
+    def _completion(self, model):
+        return {
+            "id": f"chatcmpl-fake-{self.counts['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reading},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": 200,
+                "completion_tokens": len(self.reading.split()),
+                "total_tokens": 200 + len(self.reading.split()),
+            },
+        }
+
+    def _chunk(self, model, content, finish_reason=None):
+        delta = {"content": content} if content is not None else {}
+        return {
+            "id": f"chatcmpl-fake-{self.counts['requests']}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    async def _send_event_stream(self, writer, model, keep_alive):
+        writer.write(response_head(200, "text/event-stream", keep_alive, ["Transfer-Encoding: chunked"]))
+        drop_at = None
+        if random.random() < self.faults.drop_stream:
+            drop_at = random.randrange(1, max(len(self.reading) // self.chunk_size, 2))
+        for index, start in enumerate(range(0, len(self.reading), self.chunk_size)):
+            if index == drop_at:
+                # Cut the connection without the terminating chunk
+                self.counts["dropped"] += 1
+                writer.transport.abort()
+                return False
+            event = self._chunk(model, self.reading[start:start + self.chunk_size])
+            self._write_chunk(writer, f"data: {json.dumps(event)}\n\n")
+            await writer.drain()
+            await asyncio.sleep(self.chunk_delay)
+        self._write_chunk(writer, f"data: {json.dumps(self._chunk(model, None, 'stop'))}\n\n")
+        self._write_chunk(writer, "data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return True
+
+    @staticmethod
+    def _write_chunk(writer, text):
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+    async def _respond(self, writer, body, keep_alive):
+        self.counts["requests"] += 1
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            raise HTTPError(400, "invalid JSON")
+        model = payload.get("model", "fake-model")
+        faults = self.faults
+        roll = random.random()
+        if roll < faults.rate_limit:
+            self.counts["rate_limited"] += 1
+            await send_json(writer, 429, {"error": {"message": "Rate limit reached (fake)", "type": "tokens"}},
+                            keep_alive, [f"retry-after: {faults.retry_after}"])
+            return True
+        roll -= faults.rate_limit
+        if roll < faults.server_error:
+            self.counts["server_error"] += 1
+            await send_json(writer, 503, {"error": {"message": "Service unavailable (fake)"}}, keep_alive)
+            return True
+        roll -= faults.server_error
+        if roll < faults.hang:
+            self.counts["hung"] += 1
+            await asyncio.sleep(faults.hang_seconds)
+            return False
+        await asyncio.sleep(faults.latency)
+        if payload.get("stream"):
+            if not await self._send_event_stream(writer, model, keep_alive):
+                return False
+        else:
+            await send_json(writer, 200, self._completion(model), keep_alive)
+        self.counts["ok"] += 1
+        return True
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, params, body, keep_alive = request
+                if method != "POST" or path != COMPLETIONS_PATH:
+                    await send_json(writer, 404, {"error": {"message": f"no route for {path}"}}, keep_alive)
+                elif not await self._respond(writer, body, keep_alive):
+                    break
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            await send_json(writer, e.status, {"error": {"message": e.message}}, False)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=HOST, port=PORT):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+async def serve(server, host=HOST, port=PORT):
+    listener = await server.start(host, port)
+    address = listener.sockets[0].getsockname()
+    print(f"Fake LLM backend on http://{address[0]}:{address[1]}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fault-injecting fake Groq API")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--server-error", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--hang", type=float, default=0.0, help="share of requests that never answer")
+    parser.add_argument("--drop-stream", type=float, default=0.0, help="share of streams cut off part way")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before a normal response starts")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after sent with 429s")
+    args = parser.parse_args()
+    faults = FaultConfig(args.rate_limit, args.server_error, args.hang, args.drop_stream,
+                         latency=args.latency, retry_after=args.retry_after)
+    try:
+        asyncio.run(serve(FakeLLMServer(faults), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
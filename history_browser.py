@@ -0,0 +1,100 @@
+import time
+import tkinter as tk
+
+from reading_history import PAGE_SIZE, reading_history
+
+# Milliseconds to wait after the last keystroke before searching
+SEARCH_DELAY_MS = 250
+
+
+class HistoryBrowser:
+    # Window listing past readings, newest first, with a search box.
+    # Only one page is loaded at first; the next one is fetched when the list
+    # is scrolled to its end.
+
+    def __init__(self, root, history=reading_history):
+        self.history = history
+        self.entries = []
+        self.exhausted = False
+        self._search_job = None
+
+        self.window = tk.Toplevel(root)
+        self.window.title("Reading History")
+        self.window.geometry("760x520")
+        self.window.grid_rowconfigure(1, weight=1)
+        self.window.grid_columnconfigure(0, weight=1)
+        self.window.grid_columnconfigure(1, weight=2)
+
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(self.window, textvariable=self.search_var)
+        search_entry.grid(row=0, column=0, columnspan=2, padx=10, pady=6, sticky="we")
+        self.search_var.trace_add("write", lambda *args: self._schedule_search())
+
+        list_frame = tk.Frame(self.window)
+        list_frame.grid(row=1, column=0, padx=(10, 4), pady=(0, 10), sticky="nsew")
+        list_frame.grid_rowconfigure(0, weight=1)
+        list_frame.grid_columnconfigure(0, weight=1)
+        self.listbox = tk.Listbox(list_frame, activestyle="none", exportselection=False)
+        self.listbox.grid(row=0, column=0, sticky="nsew")
+        scrollbar = tk.Scrollbar(list_frame, orient="vertical", command=self.listbox.yview)
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.listbox.config(yscrollcommand=lambda first, last: self._on_scroll(scrollbar, first, last))
+        self.listbox.bind("<<ListboxSelect>>", lambda event: self._show_selected())
+
+        self.text_box = tk.Text(self.window, wrap="word", font=("Courier New", 10), state="disabled")
+        self.text_box.grid(row=1, column=1, padx=(4, 10), pady=(0, 10), sticky="nsew")
+
+        search_entry.focus_set()
+        self.reload()
+
+    def reload(self):
+        self._search_job = None
+        self.entries = []
+        self.exhausted = False
+        self.listbox.delete(0, tk.END)
+        self.load_more()
+
+    def load_more(self):
+        if self.exhausted:
+            return
+        before_id = self.entries[-1].id if self.entries else None
+        page = self.history.page(before_id, PAGE_SIZE, self.search_var.get())
+        if len(page) < PAGE_SIZE:
+            self.exhausted = True
+        for entry in page:
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.created))
+            query = entry.query or "(no question)"
+            self.listbox.insert(tk.END, f"{when}  {entry.spread:<10} {query}")
+        self.entries.extend(page)
+
+    def _on_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        # Fetch the next page once the end of the list comes into view
+        if float(last) >= 1.0 and not self.exhausted:
+            self.window.after_idle(self.load_more)
+
+    def _schedule_search(self):
+        if self._search_job is not None:
+            self.window.after_cancel(self._search_job)
+        self._search_job = self.window.after(SEARCH_DELAY_MS, self.reload)
+
+    def _show_selected(self):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        entry = self.entries[selection[0]]
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.created))
+        lines = [f"{when} - {entry.spread}"]
+        if entry.query:
+            lines.append(f"Question: {entry.query}")
+        if entry.latency is not None:
+            lines.append(f"Reading took {entry.latency:.1f}s")
+        lines += ["", "Cards:", entry.cards, "", "Tarot Reading:", entry.reading]
+        self.text_box.config(state="normal")
+        self.text_box.delete("1.0", tk.END)
+        self.text_box.insert("1.0", "\n".join(lines))
+        self.text_box.config(state="disabled")
+
+
+def open_history_browser(root):
+    return HistoryBrowser(root)
@@ -0,0 +1,124 @@
+from collections import OrderedDict
+import threading
+
+from layout import SIZE_STEP, scaled_size
+import metrics
+
+# Rough upper bound on the memory held by cached PhotoImages.
+MAX_CACHE_BYTES = 96 * 1024 * 1024
+
+
+def rotate_image(pil_image, rotation):
+    # Quarter turns are lossless transposes; anything else is resampled
+    from PIL import Image
+    transpose = {
+        90: Image.Transpose.ROTATE_90,
+        180: Image.Transpose.ROTATE_180,
+        270: Image.Transpose.ROTATE_270,
+    }.get(rotation % 360)
+    if transpose is not None:
+        return pil_image.transpose(transpose)
+    return pil_image.rotate(rotation, expand=True)
+
+
+class ScaledImageCache:
+    # LRU cache of resampled card images keyed by (image key, rotation, size).
+    # Entries are PhotoImages, so get() and add() must be called from the Tk
+    # main thread; resample() may run anywhere.
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, size_step=SIZE_STEP):
+        self.max_bytes = max_bytes
+        self.size_step = size_step
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._rotated = {}
+        self._lock = threading.Lock()
+
+    def quantize(self, width, height, scaling):
+        return scaled_size(width, height, scaling, self.size_step)
+
+    def rotated(self, key, pil_image, rotation):
+        # Rotated sources (crossing cards at 90 degrees, reversed cards at 180
+        # or 270) are kept alongside the scaled entries so each card is only
+        # rotated once, not once per draw or resize
+        if rotation == 0:
+            return pil_image
+        rotated_key = (key, rotation)
+        with self._lock:
+            rotated_image = self._rotated.get(rotated_key)
+        if rotated_image is None:
+            with metrics.span("image_rotate"):
+                rotated_image = rotate_image(pil_image, rotation)
+            with self._lock:
+                self._rotated[rotated_key] = rotated_image
+        return rotated_image
+
+    def get(self, key, pil_image, scaling, rotation=0):
+        # For quarter turns the rotated size is known without the rotated
+        # image, so a hit costs the same whichever way the card is turned
+        source = None
+        if rotation % 90 == 0:
+            source_size = pil_image.size[::-1] if rotation % 180 else pil_image.size
+        else:
+            source = self.rotated(key, pil_image, rotation)
+            source_size = source.size
+        size = self.quantize(*source_size, scaling)
+        cache_key = (key, rotation, size)
+        with self._lock:
+            photo = self._entries.get(cache_key)
+            if photo is not None:
+                self._entries.move_to_end(cache_key)
+                metrics.count("scaled_image_cache_hits_total")
+                return photo
+        metrics.count("scaled_image_cache_misses_total")
+        if source is None:
+            source = self.rotated(key, pil_image, rotation)
+        return self.add(cache_key, self._resize(source, size))
+
+    def resample(self, key, pil_image, scaling, rotation=0):
+        # The PIL half of get(), safe to call off the main thread. Returns the
+        # cache key and resized image for add() to turn into a PhotoImage later
+        source = self.rotated(key, pil_image, rotation)
+        size = self.quantize(source.width, source.height, scaling)
+        return (key, rotation, size), self._resize(source, size)
+
+    def add(self, cache_key, resized):
+        # Main thread only, like get()
+        with self._lock:
+            photo = self._entries.get(cache_key)
+            if photo is not None:
+                self._entries.move_to_end(cache_key)
+                return photo
+        with metrics.span("photo_image_create"):
+            photo = self.make_photo(resized)
+        with self._lock:
+            self._entries[cache_key] = photo
+            self.current_bytes += resized.width * resized.height * 4
+            self._evict()
+        return photo
+
+    def _resize(self, source, size):
+        # Imported here rather than at module level to keep PIL off the startup path
+        from PIL import Image
+        with metrics.span("image_resize"):
+            return source.resize(size, Image.LANCZOS)
+
+    def make_photo(self, image):
+        # Overridden by the benchmarks to run without a display
+        from PIL import ImageTk
+        return ImageTk.PhotoImage(image)
+
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            (_, _, (width, height)), _ = self._entries.popitem(last=False)
+            self.current_bytes -= width * height * 4
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rotated.clear()
+            self.current_bytes = 0
+
+
+scaled_images = ScaledImageCache()
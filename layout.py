@@ -0,0 +1,191 @@
+# Card geometry for every spread layout, independent of Tk.
+#
+# compute_layout() takes a layout name, a canvas size and the size of the card
+# images and returns where each card goes and how big it is drawn. Nothing
+# here touches a widget or an image, so the same geometry drives the desktop
+# canvas, image export and the server, and can be tested on its own.
+from collections import namedtuple
+import functools
+
+# Target widths are snapped down to a multiple of this many pixels so that
+# nearby window sizes (e.g. while dragging the window edge) share one resample.
+SIZE_STEP = 4
+# Distinct (layout, canvas size, card size) geometries kept in memory
+LAYOUT_CACHE_SIZE = 512
+
+# Top-left corner and drawn size of one card
+CardRect = namedtuple("CardRect", "x y width height rotation")
+# scaling is the factor the card images are resampled by
+Layout = namedtuple("Layout", "scaling cards")
+
+
+def scaled_size(width, height, scaling, step=SIZE_STEP):
+    # Returns the (width, height) a source of the given size is drawn at
+    new_width = max(int(width * scaling), 1)
+    if new_width > step:
+        new_width -= new_width % step
+    new_height = max(round(new_width * height / width), 1)
+    return new_width, new_height
+
+
+def _card_rects(positions, card_width, card_height, scaling, rotations):
+    return tuple(
+        CardRect(x, y, *_drawn_size(card_width, card_height, scaling, rotation), rotation)
+        for (x, y), rotation in zip(positions, rotations)
+    )
+
+
+def _drawn_size(card_width, card_height, scaling, rotation):
+    if rotation % 180:
+        return scaled_size(card_height, card_width, scaling)
+    return scaled_size(card_width, card_height, scaling)
+
+
+def single_card_layout(canvas_width, canvas_height, card_width, card_height, rotations):
+    padding_left = 32
+    padding_right = 22
+    available_width = canvas_width - padding_left - padding_right
+    scaling = min(
+        available_width / card_width,
+        canvas_height / card_height,
+        1
+    )
+    if scaling <= 0:
+        scaling = 1
+    width, height = _drawn_size(card_width, card_height, scaling, rotations[0])
+    image_x = padding_left + (available_width - width) // 2
+    image_y = (canvas_height - height) // 2
+    return Layout(scaling, _card_rects([(image_x, image_y)], card_width, card_height, scaling, rotations))
+
+
+def row_layout(canvas_width, canvas_height, card_width, card_height, rotations):
+    spacing = 25
+    padding_left = 32
+    padding_right = 22
+    num_cards = len(rotations)
+    total_width = padding_left + card_width * num_cards + spacing * (num_cards - 1) + padding_right
+    scaling = min(
+        canvas_width / total_width,
+        canvas_height / card_height
+    )
+    scaling = min(scaling, 1)
+    if scaling <= 0:
+        scaling = 1
+    horizontal_spacing = spacing * scaling
+    padding_left_scaled = padding_left * scaling
+    padding_right_scaled = padding_right * scaling
+    # Cards are spaced by the drawn size of the first one
+    drawn_width, drawn_height = _drawn_size(card_width, card_height, scaling, rotations[0])
+    total_width = (
+        padding_left_scaled
+        + drawn_width * num_cards
+        + horizontal_spacing * (num_cards - 1)
+        + padding_right_scaled
+    )
+    start_x = (canvas_width - total_width) // 2 + padding_left_scaled
+    center_y = canvas_height // 2 - drawn_height // 2
+    positions = [
+        (start_x + i * (drawn_width + horizontal_spacing), center_y)
+        for i in range(num_cards)
+    ]
+    return Layout(scaling, _card_rects(positions, card_width, card_height, scaling, rotations))
+
+
+def celtic_cross_layout(canvas_width, canvas_height, card_width, card_height, rotations):
+    spacing = 20
+    horizontal_spacing = 125
+    vertical_spacing_7_10 = -24
+    extra_horizontal_spacing_4_6 = 60
+    extra_horizontal_offset_7_10 = 30
+    padding_left = 55
+    padding_right = 35
+
+    total_width = (
+        4 * card_width
+        + 3 * horizontal_spacing
+        + 3 * extra_horizontal_spacing_4_6
+        + extra_horizontal_offset_7_10
+        + padding_left
+        + padding_right
+    )
+    total_height = card_height * 4 + (-24 * 3)
+    scaling_x = canvas_width / total_width
+    scaling_y = canvas_height / total_height
+    scaling = min(scaling_x, scaling_y, 1)
+    spacing *= scaling
+    horizontal_spacing *= scaling
+    vertical_spacing_7_10 *= scaling
+    extra_horizontal_spacing_4_6 *= scaling
+    extra_horizontal_offset_7_10 *= scaling
+    padding_left *= scaling
+    padding_right *= scaling
+    drawn_width, drawn_height = _drawn_size(card_width, card_height, scaling, rotations[0])
+    crossing_width, crossing_height = _drawn_size(card_width, card_height, scaling, rotations[1])
+    total_width = (
+        4 * drawn_width
+        + 3 * horizontal_spacing
+        + 3 * extra_horizontal_spacing_4_6
+        + extra_horizontal_offset_7_10
+        + padding_left
+        + padding_right
+    )
+    leftmost_x = (canvas_width - total_width) / 2 + padding_left
+    center_x = leftmost_x + drawn_width + horizontal_spacing + extra_horizontal_spacing_4_6
+    center_y = canvas_height / 2 - drawn_height / 2
+    positions = [
+        (center_x, center_y),
+        (
+            center_x + (drawn_width - crossing_width) / 2,
+            center_y + (drawn_height - crossing_height) / 2,
+        ),
+        (center_x, center_y + drawn_height + spacing),
+        (
+            center_x - drawn_width - horizontal_spacing - extra_horizontal_spacing_4_6,
+            center_y,
+        ),
+        (center_x, center_y - drawn_height - spacing),
+        (
+            center_x + drawn_width + horizontal_spacing + extra_horizontal_spacing_4_6,
+            center_y,
+        ),
+    ]
+    x_offset = (
+        center_x
+        + 2 * (drawn_width + horizontal_spacing)
+        + extra_horizontal_offset_7_10
+        + 2 * extra_horizontal_spacing_4_6
+    )
+    y_offset = center_y + 1.5 * (drawn_height + vertical_spacing_7_10)
+    for i in range(6, 10):
+        positions.append(
+            (x_offset, y_offset - (drawn_height + vertical_spacing_7_10) * (i - 6))
+        )
+    return Layout(scaling, _card_rects(positions, card_width, card_height, scaling, rotations))
+
+
+# Layouts referenced by Spread.layout
+LAYOUTS = {
+    "single": single_card_layout,
+    "row": row_layout,
+    "celtic_cross": celtic_cross_layout,
+}
+
+
+@functools.lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def compute_layout(layout, canvas_width, canvas_height, card_width, card_height, rotations):
+    # rotations holds the rotation of every position, so its length is the
+    # number of cards. Only whether a card lies sideways matters, so callers
+    # pass rotations modulo 180 and reversed cards share one cached geometry.
+    # Returns None while the canvas has no size yet.
+    #
+    # Memoized on the exact canvas size rather than a coarser bucket because
+    # the cards are centred in the canvas; the resampled card sizes are
+    # already bucketed by scaled_size().
+    if canvas_width <= 0 or canvas_height <= 0:
+        return None
+    return LAYOUTS[layout](canvas_width, canvas_height, card_width, card_height, rotations)
+
+
+def spread_layout(spread, canvas_width, canvas_height, card_size):
+    # Geometry of a registered spread whose card images are card_size
+    return compute_layout(spread.layout, canvas_width, canvas_height, *card_size, spread.rotation_list)
@@ -0,0 +1,287 @@
+import random
+import re
+import threading
+import time
+
+# Seconds allowed for a single attempt (connect + response)
+ATTEMPT_TIMEOUT = 45
+# Seconds allowed for the whole request, retries and backoff included
+REQUEST_DEADLINE = 90
+MAX_ATTEMPTS = 4
+# Full-jitter exponential backoff: sleep uniform(0, min(MAX, BASE * 2**attempt))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20
+# Consecutive timeouts/outages before the breaker opens, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+
+TIMEOUT = "timeout"
+RATE_LIMITED = "rate_limited"
+UNAVAILABLE = "unavailable"
+CIRCUIT_OPEN = "circuit_open"
+REJECTED = "rejected"
+NO_CLIENT = "no_client"
+
+USER_MESSAGES = {
+    TIMEOUT: "The reading took too long to arrive. Please try again.",
+    RATE_LIMITED: "The reading service is busy right now. Please try again in a moment.",
+    UNAVAILABLE: "The reading service could not be reached. Please try again later.",
+    CIRCUIT_OPEN: "The reading service could not be reached. Please try again later.",
+    REJECTED: "The reading request was rejected by the reading service.",
+}
+
+
+class ReadingError(Exception):
+    def __init__(self, kind, message, retryable=False, retry_after=None, status_code=None):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+        self.retryable = retryable
+        # Seconds the server asked us to wait, if it said
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+    def user_message(self):
+        return USER_MESSAGES.get(self.kind)
+
+
+class ReadingResult:
+    # Outcome of generate_tarot_reading: the text, or the error that stopped it
+
+    def __init__(self, text=None, error=None, latency=0.0, cached=False):
+        self.text = text
+        self.error = error
+        self.latency = latency
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.error is None and bool(self.text)
+
+
+def _parse_duration(value):
+    # Accepts plain seconds ("1.5") and Groq's reset format ("1m2.5s", "250ms")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    parts = re.findall(r"([\d.]+)(ms|s|m|h)", value or "")
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def retry_after_seconds(error):
+    # For 429s: how long the server asked us to wait, or else when the
+    # per-minute token window resets. x-ratelimit-reset-requests is not used:
+    # for Groq it is the requests-per-day window, often minutes away
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("retry-after-ms") is not None:
+        milliseconds = _parse_duration(headers.get("retry-after-ms"))
+        if milliseconds is not None:
+            return milliseconds / 1000
+    for header in ("retry-after", "x-ratelimit-reset-tokens"):
+        seconds = _parse_duration(headers.get(header))
+        if seconds is not None:
+            return seconds
+    return None
+
+
+def classify(error):
+    # Maps client exceptions to a ReadingError without importing groq: the
+    # SDK's errors carry status_code, and its timeout/connection errors are
+    # recognised by name
+    if isinstance(error, ReadingError):
+        return error
+    status_code = getattr(error, "status_code", None)
+    name = type(error).__name__
+    if status_code == 429:
+        return ReadingError(RATE_LIMITED, str(error), True, retry_after_seconds(error), status_code)
+    if status_code is not None and status_code >= 500:
+        # Outages are retried with jittered backoff; rate limit headers on a
+        # 5xx say nothing about when the service will be back
+        return ReadingError(UNAVAILABLE, str(error), True, status_code=status_code)
+    if status_code is not None:
+        return ReadingError(REJECTED, str(error), False, status_code=status_code)
+    if isinstance(error, TimeoutError) or "Timeout" in name:
+        return ReadingError(TIMEOUT, str(error) or "request timed out", True)
+    # httpx raises e.g. ConnectError, or RemoteProtocolError for a stream cut short
+    if isinstance(error, (ConnectionError, OSError)) or any(
+        part in name for part in ("Connect", "Network", "Protocol")
+    ):
+        return ReadingError(UNAVAILABLE, str(error) or "connection failed", True)
+    return ReadingError(REJECTED, f"{name}: {error}", False)
+
+
+class CircuitBreaker:
+    # Opens after BREAKER_FAILURE_THRESHOLD consecutive outages and then fails
+    # requests immediately for BREAKER_COOLDOWN seconds. After that a single
+    # trial request is let through ("half open"); its outcome closes the
+    # breaker again or restarts the cooldown.
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def before_request(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            remaining = max(self.cooldown - (time.monotonic() - self.opened_at), 0)
+        raise ReadingError(CIRCUIT_OPEN, "reading service marked as down", retry_after=remaining)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self, error):
+        # Rate limits and rejected requests mean the backend is up
+        if error.kind not in (TIMEOUT, UNAVAILABLE):
+            with self._lock:
+                self._trial_in_flight = False
+            return
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._trial_in_flight:
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class LLMTransport:
+    # Wraps chat completion calls with per-attempt timeouts, an overall
+    # deadline, jittered exponential backoff that honors rate-limit headers
+    # and a circuit breaker. Failures are raised as ReadingError.
+
+    def __init__(self, get_client, get_async_client=None, attempt_timeout=ATTEMPT_TIMEOUT,
+                 deadline=REQUEST_DEADLINE, max_attempts=MAX_ATTEMPTS, breaker=None):
+        self.get_client = get_client
+        self.get_async_client = get_async_client
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = 0
+
+    def _attempt_timeout(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ReadingError(TIMEOUT, "request deadline exceeded", True)
+        return min(self.attempt_timeout, remaining)
+
+    def _retry_delay(self, error, attempt, deadline):
+        # Returns how long to wait before the next attempt, or raises the error
+        # when it should not (or can no longer) be retried
+        self.breaker.record_failure(error)
+        if not error.retryable or attempt + 1 >= self.max_attempts:
+            raise error
+        delay = error.retry_after
+        if delay is None:
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            raise error
+        self.retries += 1
+        return delay
+
+    def _create(self, client, params, deadline):
+        self.breaker.before_request()
+        return client.chat.completions.create(**params, timeout=self._attempt_timeout(deadline))
+
+    def complete(self, params, on_retry=None):
+        client = self.get_client()
+        if client is None:
+            raise ReadingError(NO_CLIENT, "groq is not installed")
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                completion = self._create(client, params, deadline)
+                self.breaker.record_success()
+                return completion
+            except Exception as e:
+                error = classify(e)
+                if error.kind == CIRCUIT_OPEN:
+                    raise error
+                delay = self._retry_delay(error, attempt, deadline)
+            if on_retry is not None:
+                on_retry(error)
+            time.sleep(delay)
+            attempt += 1
+
+    def stream(self, params, on_retry=None):
+        # Retries only cover opening the stream; once chunks have been handed
+        # out a failure is raised, since the text cannot be taken back
+        stream = self.complete({**params, "stream": True}, on_retry)
+        deadline = time.monotonic() + self.deadline
+        try:
+            for chunk in stream:
+                yield chunk
+                if time.monotonic() > deadline:
+                    raise ReadingError(TIMEOUT, "request deadline exceeded while streaming")
+        except Exception as e:
+            error = classify(e)
+            self.breaker.record_failure(error)
+            raise error from e
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+    async def complete_async(self, params, on_retry=None):
+        import asyncio
+        client = self.get_async_client()
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                completion = await self._create(client, params, deadline)
+                self.breaker.record_success()
+                return completion
+            except Exception as e:
+                error = classify(e)
+                if error.kind == CIRCUIT_OPEN:
+                    raise error
+                delay = self._retry_delay(error, attempt, deadline)
+            if on_retry is not None:
+                on_retry(error)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def stream_async(self, params, on_retry=None):
+        stream = await self.complete_async({**params, "stream": True}, on_retry)
+        deadline = time.monotonic() + self.deadline
+        try:
+            async for chunk in stream:
+                yield chunk
+                if time.monotonic() > deadline:
+                    raise ReadingError(TIMEOUT, "request deadline exceeded while streaming")
+        except Exception as e:
+            error = classify(e)
+            self.breaker.record_failure(error)
+            raise error from e
+        finally:
+            close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+            if close is not None:
+                await close()
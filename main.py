@@ -1,342 +1,118 @@
 import tkinter as tk
-from PIL import Image, ImageTk
+import argparse
+import logging
 import os
-import random
-import threading
-
-from tarot_deck import tarot_deck
-
-# Try to import Groq and set up the client if available
-try:
-    from groq import Groq
-    # Set your Groq API key
-    groq_api_key = 'REPLACE_THIS_WITH_YOUR_GROQ_API_KEY'  # Replace with your actual Groq API key (within the apostrophes)
-
-    client = Groq(
-        api_key=groq_api_key,
-    )
-    groq_available = True
-except ImportError:
-    groq_available = False
-    client = None
-
-def generate_tarot_reading(cards, query):
-    # Check if Groq is available and the client is initialized
-    if not groq_available or client is None:
-        return None  # No reading generated
-
-    # Include the user's query in the prompt without referencing "the querent"
-    if query.strip():
-        query_text = f"The following question is considered: '{query.strip()}'."
-    else:
-        query_text = "No specific question is provided."
-
-    # Determine the spread type based on the number of cards
-    num_cards = len(cards)
-    if num_cards == 1:
-        # Build the prompt for a one-card reading
-        prompt = f"""
-{query_text}
-
-Provide a reading based on the following card:
-
-{cards[0]['name']}.
-
-Interpret the card without referencing the client directly. Do not use 'you', 'your', or 'the querent' in the reading. Do not assign specific positions or standard meanings to the card. Do not include any introductory phrases or acknowledgements. Start the reading directly and ensure it relates to the question if one is provided.
-"""
-    elif num_cards == 3:
-        # Build the prompt for a three-card reading
-        card_list = "\n".join([f"Card {i+1}: {cards[i]['name']}" for i in range(3)])
-        prompt = f"""
-{query_text}
-
-Provide a reading based on the following cards:
-
-{card_list}
-
-Provide an interpretation for each card individually, without assigning specific positions or standard meanings to each card, **and then give an overall interpretation at the end that ties all the insights together**. Do not reference the client directly. Do not use 'you', 'your', or 'the querent' in the reading. Do not include any introductory phrases or acknowledgements. Start the reading directly and ensure it relates to the question if one is provided.
-"""
-    elif num_cards == 10:
-        # Positions for Celtic Cross
-        positions = [
-            "Present Situation (1)",
-            "Influences or Challenges (2)",
-            "Distant Past (3)",
-            "Recent Past (4)",
-            "Best Outcome (5)",
-            "Immediate Future (6)",
-            "Advice (7)",
-            "Environment (8)",
-            "Hopes or Fears (9)",
-            "Potential Outcome (10)"
-        ]
-        card_positions = "\n".join([f"{positions[i]}: {cards[i]['name']}" for i in range(10)])
-        prompt = f"""
-{query_text}
-
-Provide a Celtic Cross reading based on the following cards and their positions:
-
-{card_positions}
-
-Associate each card with its position using the exact position names provided. Provide an interpretation for each card in its position, and then give an overall interpretation at the end that ties all the insights together. Do not reference the client directly. Do not use 'you', 'your', or 'the querent' in the reading. Do not change the position names or numbering. Do not include any introductory phrases or acknowledgements. Start the reading directly and ensure it relates to the question if one is provided.
-"""
-    else:
-        # For other spreads
-        card_names = ', '.join([card['name'] for card in cards])
-        prompt = f"""
-{query_text}
-
-Provide a reading based on the following cards:
-
-{card_names}.
-
-Interpret the cards as appropriate for a {num_cards}-card spread, without assigning specific positions or standard meanings to each card. Do not reference the client directly. Do not use 'you', 'your', or 'the querent' in the reading. Do not include any introductory phrases or acknowledgements. Start the reading directly and ensure it relates to the question if one is provided.
-"""
-    try:
-        # Use the Groq API to generate the completion
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt.strip(),
-                }
-            ],
-            model="llama-3.1-70b-versatile",  # Replace with your desired Llama model
-            max_tokens=5000,
-            temperature=0.6 ## Adjusts how "creative" the readings are.
-        )
-        reading = chat_completion.choices[0].message.content.strip()
-        return reading
-    except Exception as e:
-        # Do not return error messages
-        return None  # Simply return None if an error occurs
-
-def draw_cards(num_cards):
-    deck = tarot_deck.copy()
-    random.SystemRandom().shuffle(deck)
-    drawn_cards = deck[:num_cards]
-    return drawn_cards
-
-def draw_celtic_cross(canvas_frame, text_box, query_entry):
-    for widget in canvas_frame.winfo_children():
-        widget.destroy()
-    cards = draw_cards(10)
-    images = []
-    for i, card in enumerate(cards):
-        image_path = os.path.join(os.path.dirname(__file__), card['image'])
-        pil_image = Image.open(image_path)
-        if i == 1:
-            pil_image = pil_image.rotate(90, expand=True)
-        images.append(pil_image)
-    canvas = tk.Canvas(canvas_frame)
-    canvas.pack(fill="both", expand=True)
-    canvas.images = images
-    canvas.bind("<Configure>", lambda event: redraw_celtic_cross(canvas, images))
-    redraw_celtic_cross(canvas, images)
-    positional_names = [
-        "Present Situation (1)",
-        "Influences or Challenges (2)",
-        "Distant Past (3)",
-        "Recent Past (4)",
-        "Best Outcome (5)",
-        "Immediate Future (6)",
-        "Advice (7)",
-        "Environment (8)",
-        "Hopes or Fears (9)",
-        "Potential Outcome (10)"
-    ]
-    card_meanings = "\n".join([f"{positional_names[i]}:\n{cards[i]['name']} - {cards[i]['meaning']}\n" for i in range(10)])
-    text_box.config(state="normal")
-    text_box.delete("1.0", tk.END)
-    text_box.insert("1.0", card_meanings)
-    text_box.config(state="disabled")
-
-    # Get the user's query
-    user_query = query_entry.get()
-
-    # Generate and display the tarot reading in a separate thread
-    def update_reading():
-        reading = generate_tarot_reading(cards, user_query)
-        if reading:
+import time
+
+from deck_assets import deck_assets, PLACEHOLDER_IMAGE
+from history_browser import open_history_browser
+from image_cache import scaled_images
+from layout import compute_layout
+from llm_transport import ReadingError
+import metrics
+from prefetch import spread_prefetcher
+from reading_history import reading_history
+from reading_worker import reading_executor
+from redraw_scheduler import RedrawScheduler
+from spreads import SPREADS
+from stream_writer import TextStreamWriter
+from tarot_reading import (
+    draw_cards, generate_tarot_reading, stream_tarot_reading, warm_up_client, warm_up_connection
+)
+
+# Show readings token by token as they arrive instead of all at once
+stream_readings = True
+# Seconds to wait at exit for the reading history to be written
+HISTORY_FLUSH_TIMEOUT = 5
+
+def start_reading(spread, cards, user_query, text_box):
+    # Generate and display the tarot reading on the reading executor.
+    # A newer draw in the same window supersedes this one: queued requests
+    # are dropped and results that arrive late are not shown.
+    def update_reading(is_current):
+        if stream_readings:
+            writer = TextStreamWriter(text_box, is_current=is_current)
+            started = False
+            chunks = []
+            start = time.perf_counter()
+            try:
+                for chunk in stream_tarot_reading(cards, user_query, spread):
+                    if not is_current():
+                        break
+                    if not started:
+                        writer.write("\nTarot Reading:\n")
+                        started = True
+                    writer.write(chunk)
+                    chunks.append(chunk)
+                else:
+                    if chunks:
+                        reading_history.record(spread.name, cards, user_query, "".join(chunks),
+                                               time.perf_counter() - start)
+            except ReadingError as e:
+                # Without groq installed the app just shows the card meanings
+                if e.user_message():
+                    writer.write(f"\n\n({e.user_message()})\n" if started else f"\n({e.user_message()})\n")
+            return
+        result = generate_tarot_reading(cards, user_query, spread)
+        if result.ok:
+            reading_history.record(spread.name, cards, user_query, result.text, result.latency)
+        if is_current():
             # Schedule the GUI update in the main thread
-            text_box.after(0, display_reading, reading)
-
-    def display_reading(reading):
-        if reading:
-            text_box.config(state="normal")
-            text_box.insert(tk.END, f"\nTarot Reading:\n{reading}")
-            text_box.config(state="disabled")
-
-    threading.Thread(target=update_reading, daemon=True).start()
-
-def redraw_celtic_cross(canvas, images):
-    # [Existing code for redrawing the Celtic Cross layout]
-    canvas.delete("all")
-    canvas_width = canvas.winfo_width()
-    canvas_height = canvas.winfo_height()
-    if canvas_width <= 0 or canvas_height <= 0:
-        return
-    card_original_width = images[0].width
-    card_original_height = images[0].height
-    spacing = 20
-    horizontal_spacing = 125
-    vertical_spacing_7_10 = -24
-    extra_horizontal_spacing_4_6 = 60
-    extra_horizontal_offset_7_10 = 30
-    padding_left = 55
-    padding_right = 35
-
-    total_width = (
-        4 * card_original_width
-        + 3 * horizontal_spacing
-        + 3 * extra_horizontal_spacing_4_6
-        + extra_horizontal_offset_7_10
-        + padding_left
-        + padding_right
-    )
-    total_height = card_original_height * 4 + (-24 * 3)
-    scaling_x = canvas_width / total_width
-    scaling_y = canvas_height / total_height
-    scaling = min(scaling_x, scaling_y, 1)
-    spacing *= scaling
-    horizontal_spacing *= scaling
-    vertical_spacing_7_10 *= scaling
-    extra_horizontal_spacing_4_6 *= scaling
-    extra_horizontal_offset_7_10 *= scaling
-    padding_left *= scaling
-    padding_right *= scaling
-    resized_images = []
-    for i, pil_image in enumerate(images):
-        img = pil_image.copy()
-        new_width = max(int(img.width * scaling), 1)
-        new_height = max(int(img.height * scaling), 1)
-        img = img.resize((new_width, new_height), Image.LANCZOS)
-        resized_image = ImageTk.PhotoImage(img)
-        resized_images.append(resized_image)
-    card_width = resized_images[0].width()
-    card_height = resized_images[0].height()
-    total_width = (
-        4 * card_width
-        + 3 * horizontal_spacing
-        + 3 * extra_horizontal_spacing_4_6
-        + extra_horizontal_offset_7_10
-        + padding_left
-        + padding_right
-    )
-    leftmost_x = (canvas_width - total_width) / 2 + padding_left
-    center_x = leftmost_x + card_width + horizontal_spacing + extra_horizontal_spacing_4_6
-    center_y = canvas_height / 2 - card_height / 2
-    positions = [
-        (center_x, center_y),
-        (
-            center_x + (card_width - resized_images[1].width()) / 2,
-            center_y + (card_height - resized_images[1].height()) / 2,
-        ),
-        (center_x, center_y + card_height + spacing),
-        (
-            center_x - card_width - horizontal_spacing - extra_horizontal_spacing_4_6,
-            center_y,
-        ),
-        (center_x, center_y - card_height - spacing),
-        (
-            center_x + card_width + horizontal_spacing + extra_horizontal_spacing_4_6,
-            center_y,
-        ),
-    ]
-    x_offset = (
-        center_x
-        + 2 * (card_width + horizontal_spacing)
-        + extra_horizontal_offset_7_10
-        + 2 * extra_horizontal_spacing_4_6
-    )
-    y_offset = center_y + 1.5 * (card_height + vertical_spacing_7_10)
-    for i in range(6, 10):
-        positions.append(
-            (x_offset, y_offset - (card_height + vertical_spacing_7_10) * (i - 6))
-        )
-    for i, (x, y) in enumerate(positions):
-        canvas.create_image(x, y, image=resized_images[i], anchor='nw')
-    canvas.images = resized_images
-
-def draw_one_card(canvas_frame, text_box, query_entry):
+            text_box.after(0, display_reading, result, is_current)
+
+    def display_reading(result, is_current):
+        if not is_current():
+            return
+        if result.ok:
+            text = f"\nTarot Reading:\n{result.text}"
+        elif result.error is not None and result.error.user_message():
+            text = f"\n({result.error.user_message()})\n"
+        else:
+            return
+        text_box.config(state="normal")
+        text_box.insert(tk.END, text)
+        text_box.config(state="disabled")
+
+    # Each window is a session of its own, so draws in one kiosk window never
+    # cancel the readings of another
+    reading_executor.submit(update_reading, session=text_box.winfo_toplevel())
+
+def draw_spread(spread, canvas_frame, text_box, query_entry):
     for widget in canvas_frame.winfo_children():
         widget.destroy()
-    cards = draw_cards(1)
-    images = []
-    card = cards[0]
-    image_path = os.path.join(os.path.dirname(__file__), card['image'])
-    pil_image = Image.open(image_path)
-    images.append(pil_image)
+    frame_size = (canvas_frame.winfo_width(), canvas_frame.winfo_height())
+    prepared = spread_prefetcher.take(spread.name, frame_size)
+    if prepared is not None:
+        # Drawn, decoded and resampled in the background; only the
+        # PhotoImages are left to make
+        cards = prepared.cards
+        images = prepared.images
+        for cache_key, resized in prepared.resized:
+            scaled_images.add(cache_key, resized)
+    else:
+        cards = draw_cards(spread.num_cards)
+        images = []
+        for card, rotation in zip(cards, spread.card_rotations(cards)):
+            pil_image = deck_assets.get(card.image)
+            images.append((card.image, pil_image, rotation))
     canvas = tk.Canvas(canvas_frame)
     canvas.pack(fill="both", expand=True)
     canvas.images = images
-    canvas.bind("<Configure>", lambda event: redraw_one_card(canvas, images))
-    redraw_one_card(canvas, images)
-    card_meanings = f"Card:\n{cards[0]['name']} - {cards[0]['meaning']}\n"
-    text_box.config(state="normal")
-    text_box.delete("1.0", tk.END)
-    text_box.insert("1.0", card_meanings)
-    text_box.config(state="disabled")
-
-    # Get the user's query
-    user_query = query_entry.get()
-
-    # Generate and display the tarot reading in a separate thread
-    def update_reading():
-        reading = generate_tarot_reading(cards, user_query)
-        if reading:
-            text_box.after(0, display_reading, reading)
 
-    def display_reading(reading):
-        if reading:
-            text_box.config(state="normal")
-            text_box.insert(tk.END, f"\nTarot Reading:\n{reading}")
-            text_box.config(state="disabled")
-
-    threading.Thread(target=update_reading, daemon=True).start()
-
-def redraw_one_card(canvas, images):
-    canvas.delete("all")
-    canvas_width = canvas.winfo_width()
-    canvas_height = canvas.winfo_height()
-    if canvas_width <= 0 or canvas_height <= 0:
-        return
-    padding_left = 32
-    padding_right = 22
-    available_width = canvas_width - padding_left - padding_right
-    img = images[0]
-    scaling = min(
-        available_width / img.width,
-        canvas_height / img.height,
-        1
-    )
-    if scaling <= 0:
-        scaling = 1
-    new_width = max(int(img.width * scaling), 1)
-    new_height = max(int(img.height * scaling), 1)
-    img_resized = img.resize((new_width, new_height), Image.LANCZOS)
-    resized_image = ImageTk.PhotoImage(img_resized)
-    image_x = padding_left + (available_width - resized_image.width()) // 2
-    image_y = (canvas_height - resized_image.height()) // 2
-    canvas.create_image(image_x, image_y, image=resized_image, anchor='nw')
-    canvas.images = [resized_image]
-
-def draw_three_cards(canvas_frame, text_box, query_entry):
-    for widget in canvas_frame.winfo_children():
-        widget.destroy()
-    cards = draw_cards(3)
-    images = []
-    for card in cards:
-        image_path = os.path.join(os.path.dirname(__file__), card['image'])
-        pil_image = Image.open(image_path)
-        images.append(pil_image)
-    canvas = tk.Canvas(canvas_frame)
-    canvas.pack(fill="both", expand=True)
-    canvas.images = images
-    canvas.bind("<Configure>", lambda event: redraw_three_cards(canvas, images))
-    redraw_three_cards(canvas, images)
-    card_names = [card['name'] for card in cards]
-    card_meanings = "\n".join([f"Card {i+1}:\n{card_names[i]} - {cards[i]['meaning']}\n" for i in range(3)])
+    def redraw(size=None):
+        redraw_spread(canvas, images, spread.layout, size)
+        track_canvas_size(canvas)
+
+    canvas.redraw_scheduler = RedrawScheduler(canvas, redraw).bind()
+    # The new canvas reports 1x1 until it is laid out, but it fills the
+    # frame: draw it now at the frame's size, which is also the size the
+    # prefetched images were resampled for. Before the window is first laid
+    # out the frame is 1x1 too, and the first <Configure> draws instead
+    if min(frame_size) > 1:
+        canvas.redraw_scheduler.flush(frame_size)
+    # Get this spread's next draw ready for the next click
+    spread_prefetcher.request(spread.name)
+    card_meanings = spread.card_meanings(cards)
     text_box.config(state="normal")
     text_box.delete("1.0", tk.END)
     text_box.insert("1.0", card_meanings)
@@ -344,69 +120,47 @@ def draw_three_cards(canvas_frame, text_box, query_entry):
 
     # Get the user's query
     user_query = query_entry.get()
+    start_reading(spread, cards, user_query, text_box)
+
+def redraw_spread(canvas, images, layout, size=None):
+    # size: (width, height) to lay out for instead of the canvas's current size
+    width, height = size or (canvas.winfo_width(), canvas.winfo_height())
+    geometry = compute_layout(
+        layout,
+        width,
+        height,
+        images[0][1].width,
+        images[0][1].height,
+        # Reversed cards only change the image, not the geometry
+        tuple(rotation % 180 for _, _, rotation in images),
+    )
+    if geometry is None:
+        return
+    with metrics.span("redraw", layout=layout):
+        resized_images = [
+            scaled_images.get(key, pil_image, geometry.scaling, rotation)
+            for key, pil_image, rotation in images
+        ]
+        place_images(canvas, [(card.x, card.y) for card in geometry.cards], resized_images)
 
-    # Generate and display the tarot reading in a separate thread
-    def update_reading():
-        reading = generate_tarot_reading(cards, user_query)
-        if reading:
-            # Schedule the GUI update in the main thread
-            text_box.after(0, display_reading, reading)
-
-    def display_reading(reading):
-        if reading:
-            text_box.config(state="normal")
-            text_box.insert(tk.END, f"\nTarot Reading:\n{reading}")
-            text_box.config(state="disabled")
-
-    threading.Thread(target=update_reading, daemon=True).start()
+def track_canvas_size(canvas):
+    # Prefetched draws are resampled for the size of the frame holding the canvas
+    spread_prefetcher.set_canvas_size(canvas.master.winfo_width(), canvas.master.winfo_height())
 
-def redraw_three_cards(canvas, images):
-    canvas.delete("all")
-    canvas_width = canvas.winfo_width()
-    canvas_height = canvas.winfo_height()
-    if canvas_width <= 0 or canvas_height <= 0:
-        return
-    img_width = images[0].width
-    img_height = images[0].height
-    spacing = 25
-    padding_left = 32
-    padding_right = 22
-    total_width = padding_left + img_width * 3 + spacing * 2 + padding_right
-    scaling = min(
-        canvas_width / total_width,
-        canvas_height / img_height
-    )
-    scaling = min(scaling, 1)
-    if scaling <= 0:
-        scaling = 1
-    horizontal_spacing = spacing * scaling
-    padding_left_scaled = padding_left * scaling
-    padding_right_scaled = padding_right * scaling
-    resized_images = []
-    for img in images:
-        new_width = max(int(img.width * scaling), 1)
-        new_height = max(int(img.height * scaling), 1)
-        img_resized = img.resize((new_width, new_height), Image.LANCZOS)
-        resized_image = ImageTk.PhotoImage(img_resized)
-        resized_images.append(resized_image)
-    card_width = resized_images[0].width()
-    card_height = resized_images[0].height()
-    total_width = padding_left_scaled + card_width * 3 + horizontal_spacing * 2 + padding_right_scaled
-    start_x = (canvas_width - total_width) // 2 + padding_left_scaled
-    center_y = canvas_height // 2 - card_height // 2
-    positions = [
-        (start_x, center_y),
-        (start_x + card_width + horizontal_spacing, center_y),
-        (start_x + 2 * (card_width + horizontal_spacing), center_y)
-    ]
+def place_images(canvas, positions, resized_images):
+    # Move the canvas items from the previous redraw instead of recreating them
+    items = getattr(canvas, "card_items", [])
     for i, (x, y) in enumerate(positions):
-        canvas.create_image(x, y, image=resized_images[i], anchor='nw')
+        if i < len(items):
+            canvas.coords(items[i], x, y)
+            canvas.itemconfig(items[i], image=resized_images[i])
+        else:
+            items.append(canvas.create_image(x, y, image=resized_images[i], anchor='nw'))
+    canvas.card_items = items
     canvas.images = resized_images
 
 def setup_main_gui(root, spread_type=None):
-    sample_card_path = os.path.join(os.path.dirname(__file__), tarot_deck[0]['image'])
-    sample_card_image = Image.open(sample_card_path)
-    card_width, card_height = sample_card_image.size
+    card_width, card_height = deck_assets.card_size()
     spacing = 25
     padding_left = 30
     padding_right = 30
@@ -452,82 +206,101 @@ def setup_main_gui(root, spread_type=None):
 
     buttons_frame = tk.Frame(right_frame)
     buttons_frame.grid(row=3, column=0, padx=5, pady=(1, 10), sticky="n")
-    draw_one_card_button = tk.Button(
-        buttons_frame,
-        text="Draw One Card",
-        width=20,
-        command=lambda: draw_one_card(canvas_frame, text_box, query_entry)
-    )
-    draw_one_card_button.pack(pady=3)
-    draw_three_cards_button = tk.Button(
-        buttons_frame,
-        text="Draw Three Cards",
-        width=20,
-        command=lambda: draw_three_cards(canvas_frame, text_box, query_entry)
-    )
-    draw_three_cards_button.pack(pady=3)
-    draw_celtic_button = tk.Button(
+    for spread in SPREADS.values():
+        button = tk.Button(
+            buttons_frame,
+            text=spread.label,
+            width=20,
+            command=lambda spread=spread: draw_spread(spread, canvas_frame, text_box, query_entry)
+        )
+        button.pack(pady=3)
+        # A click is likely to follow, so have a connection to the API ready for its reading
+        button.bind("<Enter>", lambda event: warm_up_connection())
+    history_button = tk.Button(
         buttons_frame,
-        text="Draw Celtic Cross",
+        text="Reading History",
         width=20,
-        command=lambda: draw_celtic_cross(canvas_frame, text_box, query_entry)
+        command=lambda: open_history_browser(root)
     )
-    draw_celtic_button.pack(pady=3)
+    history_button.pack(pady=(9, 3))
     if spread_type is None:
         add_placeholder(canvas_frame)
     else:
-        if spread_type == "celtic":
-            draw_celtic_cross(canvas_frame, text_box, query_entry)
-        elif spread_type == "one":
-            draw_one_card(canvas_frame, text_box, query_entry)
-        elif spread_type == "three":
-            draw_three_cards(canvas_frame, text_box, query_entry)
+        draw_spread(SPREADS[spread_type], canvas_frame, text_box, query_entry)
 
 def add_placeholder(canvas_frame):
+    for widget in canvas_frame.winfo_children():
+        widget.destroy()
+    canvas = tk.Canvas(canvas_frame)
+    canvas.pack(fill="both", expand=True)
+    # First drawn by the <Configure> that follows the window being mapped,
+    # so the window appears before the placeholder image is decoded
+    canvas.redraw_scheduler = RedrawScheduler(canvas, lambda: redraw_placeholder(canvas)).bind()
+
+def redraw_placeholder(canvas):
+    if canvas.winfo_width() <= 0 or canvas.winfo_height() <= 0:
+        return
     try:
-        for widget in canvas_frame.winfo_children():
-            widget.destroy()
-        image_path = os.path.join(os.path.dirname(__file__), "back.gif")
-        pil_image = Image.open(image_path)
-        canvas = tk.Canvas(canvas_frame)
-        canvas.pack(fill="both", expand=True)
-        canvas.placeholder_image = pil_image
-        canvas.bind("<Configure>", lambda event: redraw_placeholder(canvas, pil_image))
-        redraw_placeholder(canvas, pil_image)
-    except Exception as e:
+        pil_image = deck_assets.get(PLACEHOLDER_IMAGE)
+    except OSError as e:
         print(f"Error loading placeholder image: {e}")
-
-def redraw_placeholder(canvas, pil_image):
-    canvas.delete("all")
-    canvas_width = canvas.winfo_width()
-    canvas_height = canvas.winfo_height()
-    if canvas_width <= 0 or canvas_height <= 0:
         return
-    padding_left = 32
-    padding_right = 22
-    available_width = canvas_width - padding_left - padding_right
-    scaling = min(
-        available_width / pil_image.width,
-        canvas_height / pil_image.height,
-        1
-    )
-    if scaling <= 0:
-        scaling = 1
-    new_width = max(int(pil_image.width * scaling), 1)
-    new_height = max(int(pil_image.height * scaling), 1)
-    img = pil_image.resize((new_width, new_height), Image.LANCZOS)
-    resized_image = ImageTk.PhotoImage(img)
-    image_x = padding_left + (available_width - resized_image.width()) // 2
-    image_y = (canvas_height - resized_image.height()) // 2
-    canvas.create_image(image_x, image_y, image=resized_image, anchor='nw')
-    canvas.placeholder_image = resized_image
+    redraw_spread(canvas, [(PLACEHOLDER_IMAGE, pil_image, 0)], "single")
+    track_canvas_size(canvas)
+
+def report_first_paint(root, launch_time):
+    # Used by benchmarks/bench_startup.py: print the time from process launch
+    # until the window has been drawn, then quit
+    root.update()
+    print(f"first paint: {time.time() - launch_time:.3f}s", flush=True)
+    root.destroy()
+
+def open_kiosk(root, sessions):
+    # Kiosk mode: several independent reader windows in one process. They
+    # share the decoded deck, the scaled image cache, the prefetched draws,
+    # the LLM client and the reading executor, whose MAX_IN_FLIGHT workers
+    # take turns between the windows. The root window stays hidden; closing
+    # the last reader window quits.
+    root.withdraw()
+    windows = []
+    for number in range(1, sessions + 1):
+        window = tk.Toplevel(root)
+        window.title(f"Tarot Reader {number}")
+        setup_main_gui(window, spread_type=None)
+        window.protocol("WM_DELETE_WINDOW", lambda window=window: close_session(root, windows, window))
+        windows.append(window)
+    return windows
+
+def close_session(root, windows, window):
+    reading_executor.close_session(window)
+    windows.remove(window)
+    window.destroy()
+    if not windows:
+        root.destroy()
 
 def main():
+    parser = argparse.ArgumentParser(description="Tarot reader")
+    parser.add_argument("--sessions", type=int, default=1,
+                        help="reader windows to open in this process (kiosk mode)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
     root = tk.Tk()
     root.title("Tarot Reader")
     root.resizable(True, True)
-    setup_main_gui(root, spread_type=None)
+    if args.sessions > 1:
+        open_kiosk(root, args.sessions)
+    else:
+        setup_main_gui(root, spread_type=None)
+    # Once the window is up, import groq and decode the deck in the background
+    root.after_idle(warm_up_client)
+    root.after_idle(deck_assets.load_in_background)
+    if os.environ.get("TAROT_STARTUP_PROBE"):
+        root.after_idle(report_first_paint, root, float(os.environ["TAROT_STARTUP_PROBE"]))
     root.mainloop()
+    # The writer thread is a daemon, so readings still queued when the last
+    # window closes would be lost; give it a moment to write them out
+    if not reading_history.flush(timeout=HISTORY_FLUSH_TIMEOUT):
+        print("Reading history: some readings could not be saved before exit")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
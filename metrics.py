@@ -0,0 +1,189 @@
+# Lightweight timing spans, counters and histograms.
+#
+# Off by default. Set TAROT_METRICS to a file path to turn it on; the metrics
+# are written there at exit (and by export()), as Prometheus text format, or
+# as JSON when the path ends in .json:
+#
+#   TAROT_METRICS=metrics.prom python main.py
+#
+# When disabled, span() hands back one shared no-op context manager and
+# count()/observe() return immediately, so instrumented code pays little more
+# than a function call.
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+# Upper bounds in seconds for duration histograms
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+enabled = False
+export_path = None
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        observe(f"{self.name}_seconds", time.perf_counter() - self.start, **self.labels)
+        if exc_type is not None:
+            count(f"{self.name}_errors_total", **self.labels)
+        return False
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def enable(path=None):
+    global enabled, export_path
+    enabled = True
+    export_path = path
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def span(name, **labels):
+    # Times the with-block into the <name>_seconds histogram
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name, labels)
+
+
+def timed(name, **labels):
+    # Decorator form of span()
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with _Span(name, labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1, **labels):
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=DURATION_BUCKETS, **labels):
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram(buckets)
+        histogram.observe(value)
+
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(_counters.items())
+            ],
+            "histograms": [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(zip([*map(str, histogram.buckets), "+Inf"], histogram.bucket_counts)),
+                }
+                for (name, labels), histogram in sorted(_histograms.items())
+            ],
+        }
+
+
+def _prometheus_labels(labels, extra=()):
+    items = [*labels, *extra]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def prometheus_text():
+    lines = []
+    with _lock:
+        for (name, labels), value in sorted(_counters.items()):
+            lines.append(f"tarot_{name}{_prometheus_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, bucket_count in zip([*histogram.buckets, "+Inf"], histogram.bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"tarot_{name}_bucket{_prometheus_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"tarot_{name}_sum{_prometheus_labels(labels)} {histogram.sum}")
+            lines.append(f"tarot_{name}_count{_prometheus_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def export(path=None):
+    path = path or export_path
+    if not path:
+        return
+    if path.endswith(".json"):
+        content = json.dumps(snapshot(), indent=2)
+    else:
+        content = prometheus_text()
+    # Write to a temporary file first so a scraper never sees half a file
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(temporary_path, path)
+
+
+if os.environ.get("TAROT_METRICS"):
+    enable(os.environ["TAROT_METRICS"])
+    atexit.register(export)
@@ -0,0 +1,149 @@
+# Prepares the next draw of every spread while the app is idle.
+#
+# For each spread a background thread draws the next shuffle, decodes its
+# cards and resamples them to the size they will have on the current canvas.
+# When a draw button is clicked, the prepared draw is handed over and only the
+# PhotoImages (which must be made on the Tk main thread) are left to create.
+# Prepared draws are thrown away when the canvas size changes, and no more are
+# kept than fit in the memory budget.
+import threading
+import time
+
+from deck_assets import deck_assets
+from image_cache import scaled_images
+from layout import spread_layout
+import metrics
+from spreads import SPREADS
+from tarot_reading import draw_cards
+
+# Upper bound on the resampled images held by prepared draws
+PREFETCH_MAX_BYTES = 16 * 1024 * 1024
+# Seconds the canvas size has to stay unchanged before prefetching starts,
+# so dragging the window edge does not resample every card at every size
+PREFETCH_DELAY = 0.5
+
+
+class PreparedDraw:
+    def __init__(self, cards, canvas_size, images, resized):
+        self.cards = cards
+        self.canvas_size = canvas_size
+        # (image key, PIL image, rotation) per card, as draw_spread builds them
+        self.images = images
+        # (scaled image cache key, resized PIL image) per card
+        self.resized = resized
+        self.size_bytes = sum(image.width * image.height * 4 for _, image in resized)
+
+
+class SpreadPrefetcher:
+    def __init__(self, spreads, image_cache, max_bytes=PREFETCH_MAX_BYTES, delay=PREFETCH_DELAY):
+        self.spreads = spreads
+        self.image_cache = image_cache
+        self.max_bytes = max_bytes
+        self.delay = delay
+        self.canvas_size = None
+        # Bumped on every size change; work started before it is discarded
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self._prepared = {}
+        # Spread names still to prepare, most wanted first
+        self._wanted = []
+        self._changed_at = 0.0
+        self._cond = threading.Condition()
+        self._worker = None
+
+    def set_canvas_size(self, width, height):
+        # Tk reports 1x1 for widgets that are not mapped yet
+        if width <= 1 or height <= 1:
+            return
+        with self._cond:
+            if (width, height) == self.canvas_size:
+                return
+            self.canvas_size = (width, height)
+            self.epoch += 1
+            self.discarded += len(self._prepared)
+            self._prepared.clear()
+            self._wanted = list(self.spreads)
+            self._changed_at = time.monotonic()
+            self._start()
+            self._cond.notify()
+
+    def request(self, spread_name):
+        # Prepare the next draw of this spread before any other
+        with self._cond:
+            if spread_name in self._wanted:
+                self._wanted.remove(spread_name)
+            self._wanted.insert(0, spread_name)
+            self._start()
+            self._cond.notify()
+
+    def take(self, spread_name, canvas_size):
+        # Returns the prepared draw for this spread and canvas size, or None
+        with self._cond:
+            prepared = self._prepared.pop(spread_name, None)
+            if prepared is None or prepared.canvas_size != canvas_size:
+                self.misses += 1
+                metrics.count("prefetch_misses_total", spread=spread_name)
+                return None
+            self.hits += 1
+            metrics.count("prefetch_hits_total", spread=spread_name)
+            return prepared
+
+    def prepared_bytes(self):
+        with self._cond:
+            return sum(prepared.size_bytes for prepared in self._prepared.values())
+
+    def _start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, daemon=True)
+            self._worker.start()
+
+    def _next(self):
+        with self._cond:
+            while True:
+                if self._wanted and self.canvas_size is not None:
+                    wait = self._changed_at + self.delay - time.monotonic()
+                    if wait <= 0:
+                        spread_name = self._wanted.pop(0)
+                        if spread_name in self._prepared:
+                            continue
+                        return spread_name, self.canvas_size, self.epoch
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _work(self):
+        while True:
+            spread_name, canvas_size, epoch = self._next()
+            if self.prepared_bytes() >= self.max_bytes:
+                continue
+            try:
+                with metrics.span("prefetch", spread=spread_name):
+                    prepared = self._prepare(self.spreads[spread_name], canvas_size)
+            except Exception as e:
+                print(f"Error prefetching {spread_name}: {e}")
+                continue
+            with self._cond:
+                if epoch != self.epoch:
+                    self.discarded += 1
+                elif self.prepared_bytes() + prepared.size_bytes <= self.max_bytes:
+                    self._prepared[spread_name] = prepared
+
+    def _prepare(self, spread, canvas_size):
+        cards = draw_cards(spread.num_cards)
+        images = [
+            (card.image, deck_assets.get(card.image), rotation)
+            for card, rotation in zip(cards, spread.card_rotations(cards))
+        ]
+        # Same geometry as redraw_spread, so the resized images land on the
+        # scaled image cache keys the first redraw looks up
+        geometry = spread_layout(spread, *canvas_size, images[0][1].size)
+        resized = [
+            self.image_cache.resample(key, pil_image, geometry.scaling, rotation)
+            for key, pil_image, rotation in images
+        ]
+        return PreparedDraw(cards, canvas_size, images, resized)
+
+
+spread_prefetcher = SpreadPrefetcher(SPREADS, scaled_images)
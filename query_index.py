@@ -0,0 +1,196 @@
+# Finds stored questions that are near-paraphrases of a new one, so the
+# reading generated for "will i get the job" can be reused for "Will I get
+# this job?" asked with the same cards.
+#
+# Only questions in the same scope are compared: the spread and its exact
+# cards, reversals included, since a reading only fits the cards it
+# describes. Two questions match when their character trigram sets are
+# similar enough (Jaccard) and they ask about the same things: apart from
+# filler words ("the", "this", "please", ...) they must use the same words in
+# the same order, give or take one word with a one-letter typo. Negations and
+# pronouns have to agree exactly, so "does he love me" never matches "does
+# she love me".
+#
+# Most scopes hold a question or two and are simply scanned. A scope that
+# grows past scan_limit is bucketed by word signature: its key words, plus,
+# for each word that could be mistyped, the key words with that one reduced
+# to its first letter and length. Any question the match rule accepts (with
+# the typo, if any, not in the first letter) shares a bucket with the new
+# one, so a lookup checks only those.
+import re
+import threading
+
+from reading_cache import normalize_query
+
+# Jaccard similarity of the trigram sets at which two questions can match
+SIMILARITY_THRESHOLD = 0.65
+# Questions with fewer trigrams than this (about 6 letters) only match exactly
+MIN_SHINGLES = 8
+# Questions per scope checked one by one before they are bucketed
+SCAN_LIMIT = 32
+# Shorter words only ever match exactly
+MIN_TYPO_LENGTH = 4
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+# Words that do not change what is being asked
+FILLER_WORDS = frozenset("""
+    a an the this that these those some any is are am was were be been being do does did
+    please tell really ever just so own going gonna of in on for at
+""".split())
+# Words that change the question and must match exactly, never as a typo
+GUARD_WORDS = frozenset("""
+    not no never nor none nothing without dont doesnt didnt wont wouldnt cant cannot
+    couldnt shouldnt isnt arent wasnt werent havent hasnt
+    i me my mine myself we us our ours you your yours he him his she her hers
+    they them their theirs it its
+""".split())
+
+
+def similarity_text(query):
+    # Normalized query without punctuation, so "how's" and "hows" agree
+    return " ".join(_NON_WORD.sub("", normalize_query(query)).split())
+
+
+def shingles(text, size=3):
+    padded = f" {text} "
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+def key_words(text):
+    return tuple(word for word in text.split() if word not in FILLER_WORDS)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _typo_prone(word):
+    return len(word) >= MIN_TYPO_LENGTH and word not in GUARD_WORDS
+
+
+def _typo(a, b):
+    # True if a and b are one insertion, deletion or substitution apart
+    if abs(len(a) - len(b)) > 1 or not _typo_prone(a) or not _typo_prone(b):
+        return False
+    i = 0
+    while i < len(a) and i < len(b) and a[i] == b[i]:
+        i += 1
+    return a[i + 1:] == b[i + 1:] or a[i:] == b[i + 1:] or a[i + 1:] == b[i:]
+
+
+def same_words(a, b):
+    # a and b are key_words() tuples
+    if a == b:
+        return True
+    if len(a) != len(b):
+        return False
+    differences = [(x, y) for x, y in zip(a, b) if x != y]
+    return len(differences) == 1 and _typo(*differences[0])
+
+
+class _Scope:
+    __slots__ = ("queries", "buckets")
+
+    def __init__(self):
+        # Normalized queries, as the reading cache keys them
+        self.queries = set()
+        # Word signature -> queries, once the scope is past the scan limit
+        self.buckets = None
+
+
+class QueryIndex:
+    # In-memory and built from the reading cache at first use; thread-safe.
+    # A scope is any hashable, e.g. (spread name, tuple of card names).
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, min_shingles=MIN_SHINGLES, scan_limit=SCAN_LIMIT):
+        self.threshold = threshold
+        self.min_shingles = min_shingles
+        self.scan_limit = scan_limit
+        self.size = 0
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signatures(words, lookup=False):
+        # Bucket keys of a key_words() tuple. A stored question files each word it
+        # could have mistyped under its own length; a lookup tries the
+        # lengths one edit away as well. Only the hashes are kept: a
+        # collision just adds a candidate that fails the match check.
+        keys = [hash(words)]
+        for i, word in enumerate(words):
+            if _typo_prone(word):
+                before, after = words[:i], words[i + 1:]
+                lengths = (len(word) - 1, len(word), len(word) + 1) if lookup else (len(word),)
+                keys.extend(hash((before, word[0], length, after)) for length in lengths)
+        return keys
+
+    def _index(self, buckets, query):
+        for key in self._signatures(key_words(similarity_text(query))):
+            buckets.setdefault(key, []).append(query)
+
+    def add(self, scope, query):
+        query = normalize_query(query)
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None:
+                entry = self._scopes[scope] = _Scope()
+            if query in entry.queries:
+                return
+            entry.queries.add(query)
+            self.size += 1
+            if entry.buckets is not None:
+                self._index(entry.buckets, query)
+            elif len(entry.queries) > self.scan_limit:
+                entry.buckets = {}
+                for stored in entry.queries:
+                    self._index(entry.buckets, stored)
+
+    def discard(self, scope, query):
+        # For questions whose reading has left the cache
+        query = normalize_query(query)
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None or query not in entry.queries:
+                return
+            entry.queries.remove(query)
+            self.size -= 1
+            if not entry.queries:
+                del self._scopes[scope]
+            elif entry.buckets is not None:
+                for key in self._signatures(key_words(similarity_text(query))):
+                    bucket = entry.buckets[key]
+                    bucket.remove(query)
+                    if not bucket:
+                        del entry.buckets[key]
+
+    def find(self, scope, query):
+        # Returns (stored query, similarity) for the closest matching question
+        # in the scope, or None
+        text = similarity_text(query)
+        words = key_words(text)
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None:
+                return None
+            if entry.buckets is None:
+                candidates = list(entry.queries)
+            else:
+                candidates = set()
+                for key in self._signatures(words, lookup=True):
+                    candidates.update(entry.buckets.get(key, ()))
+        best = None
+        query_shingles = None
+        for candidate in candidates:
+            candidate_text = similarity_text(candidate)
+            if not same_words(words, key_words(candidate_text)):
+                continue
+            if query_shingles is None:
+                query_shingles = shingles(text)
+                if len(query_shingles) < self.min_shingles:
+                    return None
+            similarity = jaccard(query_shingles, shingles(candidate_text))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        return best
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import metrics
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".tarot_reader", "reading_cache.sqlite3")
+# Cached readings older than this are treated as misses and removed
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+# Least recently used readings beyond this count are evicted
+CACHE_MAX_ENTRIES = 5000
+
+
+def normalize_query(query):
+    # Case, surrounding whitespace, repeated spaces and trailing
+    # punctuation do not change the question being asked
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+
+def cache_key(spread, card_names, query):
+    raw = "\x1f".join([spread, "\x1e".join(card_names), normalize_query(query)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ReadingCache:
+    # On-disk cache of generated readings keyed by spread, ordered cards and
+    # normalized query. Safe to use from the reading worker threads.
+
+    def __init__(self, path=CACHE_PATH, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS readings (
+                    key TEXT PRIMARY KEY,
+                    spread TEXT NOT NULL,
+                    cards TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    reading TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS readings_last_access ON readings (last_access)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, spread, card_names, query):
+        key = cache_key(spread, card_names, query)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT reading, created FROM readings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM readings WHERE key = ?", (key,))
+                    conn.commit()
+                    self.evictions += 1
+                    metrics.count("reading_cache_evictions_total")
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    metrics.count("reading_cache_misses_total", spread=spread)
+                    return None
+                conn.execute("UPDATE readings SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error reading from reading cache: {e}")
+                self.misses += 1
+                metrics.count("reading_cache_misses_total", spread=spread)
+                return None
+            self.hits += 1
+            metrics.count("reading_cache_hits_total", spread=spread)
+            return row[0]
+
+    def put(self, spread, card_names, query, reading):
+        key = cache_key(spread, card_names, query)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO readings VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, spread, "|".join(card_names), normalize_query(query), reading, now, now),
+                )
+                self._evict(conn, now)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing to reading cache: {e}")
+
+    def _evict(self, conn, now):
+        expired = conn.execute(
+            "DELETE FROM readings WHERE created < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        overflow = conn.execute(
+            """DELETE FROM readings WHERE key IN (
+                SELECT key FROM readings ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,),
+        ).rowcount
+        self.evictions += expired + overflow
+        if expired + overflow:
+            metrics.count("reading_cache_evictions_total", expired + overflow)
+
+    def entries(self):
+        # (spread, card names, normalized query) of every cached reading
+        with self._lock:
+            try:
+                rows = self._connection().execute("SELECT spread, cards, query FROM readings").fetchall()
+            except sqlite3.Error as e:
+                print(f"Error reading from reading cache: {e}")
+                return []
+        return [(spread, cards.split("|"), query) for spread, cards, query in rows]
+
+    def stats(self):
+        with self._lock:
+            try:
+                entries = self._connection().execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+            }
+
+
+reading_cache = ReadingCache()
@@ -0,0 +1,177 @@
+# Append-only history of every reading shown, with full-text search.
+#
+# record() only puts the entry on a queue; a writer thread inserts queued
+# entries in batches, one transaction per batch, so the UI thread never waits
+# on the disk. Entries live in a plain table with an FTS5 index over the
+# query, cards and reading text, kept in step by an insert trigger.
+#
+# Pages are read newest first with keyset pagination (id < last id seen), so
+# fetching a page costs the same whether the history holds a hundred entries
+# or a hundred thousand.
+from collections import namedtuple
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from deck import deck
+
+HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".tarot_reader", "history.sqlite3")
+# Entries written per transaction at most
+BATCH_SIZE = 64
+# Seconds the writer waits for more entries before committing a partial batch
+FLUSH_INTERVAL = 0.5
+PAGE_SIZE = 50
+
+HistoryEntry = namedtuple("HistoryEntry", "id created spread cards card_ids query reading latency")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    spread TEXT NOT NULL,
+    cards TEXT NOT NULL,
+    card_ids TEXT NOT NULL,
+    query TEXT NOT NULL,
+    reading TEXT NOT NULL,
+    latency REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    query, cards, reading, content='history', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS history_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, query, cards, reading) VALUES (new.id, new.query, new.cards, new.reading);
+END;
+"""
+
+
+def encode_card_ids(cards):
+    # "0,13r,19": card ids, with reversed cards marked
+    return ",".join(f"{card.id}r" if card.reversed else str(card.id) for card in cards)
+
+
+def decode_card_ids(card_ids):
+    cards = []
+    for part in card_ids.split(","):
+        if part:
+            cards.append(deck.orient(deck[int(part.rstrip("r"))], part.endswith("r")))
+    return cards
+
+
+def match_expression(text):
+    # Every word must appear; the last one may be a prefix, so results follow
+    # along while a word is still being typed. Quoting keeps FTS5 syntax
+    # characters in the input from being read as operators.
+    words = text.split()
+    if not words:
+        return None
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class ReadingHistory:
+    def __init__(self, path=HISTORY_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._queue = queue.Queue()
+        self._writer = None
+        self._read_conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # A file, not ":memory:": the writer and the readers use separate connections
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL lets the browser read while the writer thread appends
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _reader(self):
+        if self._read_conn is None:
+            self._read_conn = self._connect()
+        return self._read_conn
+
+    def record(self, spread, cards, query, reading, latency=None):
+        # Returns at once; the entry is written by the writer thread
+        entry = (time.time(), spread, "\n".join(card.display_name for card in cards),
+                 encode_card_ids(cards), query, reading, latency)
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+        self._queue.put(entry)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO history (created, spread, cards, card_ids, query, reading, latency) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                self.written += len(batch)
+            except sqlite3.Error as e:
+                print(f"Error writing reading history: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout=None):
+        # Blocks until everything recorded so far has been written, or for at
+        # most timeout seconds; returns whether it all was
+        done = self._queue.all_tasks_done
+        with done:
+            return done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+
+    def page(self, before_id=None, limit=PAGE_SIZE, search=None):
+        # Newest entries first. Pass the id of the last entry of the previous
+        # page as before_id to get the next one.
+        if before_id is None:
+            before_id = 2 ** 63 - 1
+        expression = match_expression(search or "")
+        with self._lock:
+            try:
+                conn = self._reader()
+                if expression is None:
+                    rows = conn.execute(
+                        f"SELECT {', '.join(HistoryEntry._fields)} FROM history "
+                        "WHERE id < ? ORDER BY id DESC LIMIT ?",
+                        (before_id, limit),
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        f"SELECT {', '.join('history.' + field for field in HistoryEntry._fields)} "
+                        "FROM history_fts JOIN history ON history.id = history_fts.rowid "
+                        "WHERE history_fts MATCH ? AND history_fts.rowid < ? "
+                        "ORDER BY history_fts.rowid DESC LIMIT ?",
+                        (expression, before_id, limit),
+                    ).fetchall()
+            except sqlite3.Error as e:
+                print(f"Error reading reading history: {e}")
+                return []
+        return [HistoryEntry(*row) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._reader().execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+
+reading_history = ReadingHistory()
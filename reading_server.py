@@ -0,0 +1,349 @@
+# Async HTTP service for draws and readings.
+#
+#   GET  /draw?spread=three          -> {"spread": ..., "cards": [{id, name, meaning, image, reversed}, ...],
+#                                        "ids": [...], "reversed": [...]}
+#   POST /reading {"spread": "three", "cards": [names or ids], "reversed": [bools], "query": "...",
+#                  "stream": false}
+#                                    -> {"reading": "..."}, or the reading as a
+#                                       chunked text/plain stream when stream is true.
+#                                       Without "spread" it goes by the number of cards,
+#                                       which must be that of a registered spread
+#   GET  /image?spread=three&cards=0,13,19&reversed=0,1,0&width=1280&height=800&format=png
+#                                    -> the spread rendered as a PNG or WebP image
+#   GET  /tokens                     -> tokens per reading by spread, and the current max_tokens
+#
+# All requests run on one event loop and share the pooled async client from
+# tarot_reading. Only the standard library is used for the HTTP side.
+#
+#   python reading_server.py --port 8080
+#
+# Set TAROT_FAKE_LLM=1 to serve readings from the offline fake client.
+import argparse
+import asyncio
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from deck import deck
+import llm_transport
+from llm_transport import ReadingError
+import spread_image
+from spreads import SPREADS, spread_for_cards
+import tarot_reading
+from tarot_reading import draw_cards, generate_tarot_reading_async, stream_tarot_reading_async
+from token_accounting import TOKENS_PER_MINUTE, token_accountant
+
+HOST = "127.0.0.1"
+PORT = 8080
+MAX_BODY_BYTES = 64 * 1024
+# Idle keep-alive connections are closed after this many seconds
+KEEP_ALIVE_TIMEOUT = 15
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+# HTTP status returned for each kind of failed reading
+READING_ERROR_STATUS = {
+    llm_transport.RATE_LIMITED: 429,
+    llm_transport.UNAVAILABLE: 503,
+    llm_transport.CIRCUIT_OPEN: 503,
+    llm_transport.TIMEOUT: 504,
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = list(headers)
+
+
+def reading_failed(error):
+    # The HTTPError for a ReadingError, passing on how long to wait if known
+    headers = []
+    if error.retry_after is not None:
+        headers.append(f"Retry-After: {max(int(error.retry_after + 0.999), 1)}")
+    return HTTPError(READING_ERROR_STATUS.get(error.kind, 502), f"reading failed: {error.kind}", headers)
+
+
+async def read_request(reader):
+    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0) or 0)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+    return method, url.path, params, body, keep_alive
+
+
+def response_head(status, content_type, keep_alive, extra_headers=()):
+    lines = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        *extra_headers,
+    ]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer, status, payload, keep_alive, extra_headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(response_head(
+        status, "application/json", keep_alive, [f"Content-Length: {len(body)}", *extra_headers]
+    ))
+    writer.write(body)
+    await writer.drain()
+
+
+async def send_bytes(writer, status, content_type, data, keep_alive):
+    writer.write(response_head(status, content_type, keep_alive, [f"Content-Length: {len(data)}"]))
+    writer.write(data)
+    await writer.drain()
+
+
+async def send_chunk(writer, chunk):
+    data = chunk.encode("utf-8")
+    writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+    await writer.drain()
+
+
+async def send_stream(writer, chunks, keep_alive):
+    # The head waits for the first chunk, so a reading that fails before any
+    # text arrives gets its error status instead of an empty 200. Failures
+    # after that can only drop the connection
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except ReadingError as e:
+        raise reading_failed(e)
+    writer.write(response_head(200, "text/plain; charset=utf-8", keep_alive, ["Transfer-Encoding: chunked"]))
+    if first is not None:
+        await send_chunk(writer, first)
+        async for chunk in chunks:
+            await send_chunk(writer, chunk)
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+def parse_json_body(body):
+    try:
+        payload = json.loads(body or b"{}")
+    except json.JSONDecodeError:
+        raise HTTPError(400, "request body is not valid JSON")
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "request body must be a JSON object")
+    return payload
+
+
+def handle_draw(params):
+    spread = params.get("spread", "one")
+    if spread not in SPREADS:
+        raise HTTPError(400, f"unknown spread {spread!r}, expected one of {sorted(SPREADS)}")
+    cards = draw_cards(SPREADS[spread].num_cards)
+    return {
+        "spread": spread,
+        "cards": [card.to_dict() for card in cards],
+        "ids": deck.ids(cards),
+        "reversed": [card.reversed for card in cards],
+    }
+
+
+def resolve_cards(references, reversed_flags=None):
+    # Cards may be given by name or by id; ids are the compact form.
+    # reversed_flags, when given, has one flag per card.
+    if reversed_flags is None:
+        reversed_flags = [False] * len(references)
+    if not isinstance(reversed_flags, list) or len(reversed_flags) != len(references):
+        raise HTTPError(400, "'reversed' must have one flag per card")
+    # Only true and false: a string like "false" would otherwise reverse the card
+    if not all(isinstance(flag, bool) for flag in reversed_flags):
+        raise HTTPError(400, "'reversed' flags must be true or false")
+    cards = []
+    unknown = []
+    for reference, reversed_card in zip(references, reversed_flags):
+        if isinstance(reference, str) and reference.isdigit():
+            reference = int(reference)
+        if isinstance(reference, int) and not isinstance(reference, bool) and 0 <= reference < len(deck):
+            cards.append(deck.orient(deck[reference], reversed_card))
+        elif isinstance(reference, str) and reference in deck.by_name:
+            cards.append(deck.orient(deck.by_name[reference], reversed_card))
+        else:
+            unknown.append(reference)
+    if unknown:
+        raise HTTPError(400, f"unknown cards: {unknown}")
+    # A draw never repeats a card
+    ids = deck.ids(cards)
+    if len(set(ids)) != len(ids):
+        raise HTTPError(400, "each card may appear only once")
+    return cards
+
+
+def image_request(params):
+    spread = params.get("spread", "three")
+    references = [name.strip() for name in params.get("cards", "").split(",") if name.strip()]
+    reversed_flags = None
+    if params.get("reversed"):
+        reversed_flags = [flag.strip() in ("1", "true") for flag in params["reversed"].split(",")]
+    cards = resolve_cards(references, reversed_flags)
+    try:
+        width = int(params.get("width", 1280))
+        height = int(params.get("height", 800))
+    except ValueError:
+        raise HTTPError(400, "'width' and 'height' must be integers")
+    image_format = params.get("format", "png")
+    try:
+        spread_image.check_request(spread, width, height, image_format)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    if len(cards) != SPREADS[spread].num_cards:
+        raise HTTPError(400, f"{spread} takes {SPREADS[spread].num_cards} cards, got {len(cards)}")
+    image_names = [card.image for card in cards]
+    return spread, image_names, width, height, image_format, [card.reversed for card in cards]
+
+
+def reading_request(payload):
+    references = payload.get("cards")
+    if not isinstance(references, list) or not references:
+        raise HTTPError(400, "'cards' must be a non-empty list of card names or ids")
+    cards = resolve_cards(references, payload.get("reversed"))
+    query = payload.get("query") or ""
+    if not isinstance(query, str):
+        raise HTTPError(400, "'query' must be a string")
+    spread = payload.get("spread")
+    if spread is None:
+        # Only the card counts of registered spreads: any other count would
+        # make spread_for_cards build and keep an ad-hoc spread for it
+        sizes = sorted({registered.num_cards for registered in SPREADS.values()})
+        if len(cards) not in sizes:
+            raise HTTPError(400, f"a reading takes {sizes} cards, got {len(cards)}")
+        return cards, query, spread_for_cards(cards)
+    if not isinstance(spread, str) or spread not in SPREADS:
+        raise HTTPError(400, f"unknown spread {spread!r}, expected one of {sorted(SPREADS)}")
+    if len(cards) != SPREADS[spread].num_cards:
+        raise HTTPError(400, f"{spread} takes {SPREADS[spread].num_cards} cards, got {len(cards)}")
+    return cards, query, SPREADS[spread]
+
+
+class ReadingServer:
+    def __init__(self, use_cache=True):
+        self.use_cache = use_cache
+        self.requests_served = 0
+        self.active_connections = 0
+
+    async def dispatch(self, writer, method, path, params, body, keep_alive):
+        if path == "/draw":
+            if method not in ("GET", "POST"):
+                raise HTTPError(405, "use GET or POST")
+            await send_json(writer, 200, handle_draw(params), keep_alive)
+        elif path == "/reading":
+            if method != "POST":
+                raise HTTPError(405, "use POST")
+            payload = parse_json_body(body)
+            cards, query, spread = reading_request(payload)
+            if payload.get("stream"):
+                chunks = stream_tarot_reading_async(cards, query, self.use_cache, spread=spread)
+                await send_stream(writer, chunks, keep_alive)
+                return
+            try:
+                reading = await generate_tarot_reading_async(cards, query, use_cache=self.use_cache, spread=spread)
+            except ReadingError as e:
+                raise reading_failed(e)
+            await send_json(writer, 200, {"reading": reading}, keep_alive)
+        elif path == "/image":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            spread, image_names, width, height, image_format, reversed_flags = image_request(params)
+            # Rendering is CPU bound, so keep it off the event loop
+            data = await asyncio.get_running_loop().run_in_executor(
+                None, spread_image.spread_images.get, spread, image_names, width, height, image_format, reversed_flags
+            )
+            await send_bytes(writer, 200, spread_image.CONTENT_TYPES[image_format], data, keep_alive)
+        elif path == "/tokens":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            await send_json(writer, 200, token_accountant.report(), keep_alive)
+        else:
+            raise HTTPError(404, f"no route for {path}")
+
+    async def handle_connection(self, reader, writer):
+        self.active_connections += 1
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, path, params, body, keep_alive = request
+                    await self.dispatch(writer, method, path, params, body, keep_alive)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": e.message}, keep_alive, e.headers)
+                self.requests_served += 1
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            # e.g. the LLM failing part-way through a stream, after the
+            # response head was sent; all that can be done is drop the connection
+            print(f"Error handling request: {e}")
+        finally:
+            self.active_connections -= 1
+            writer.close()
+
+    async def start(self, host=HOST, port=PORT):
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+
+async def serve(host=HOST, port=PORT, use_cache=True):
+    server = await ReadingServer(use_cache).start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving tarot readings on http://{address[0]}:{address[1]}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve tarot draws and readings over HTTP")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--no-cache", action="store_true", help="always call the API, even for cached readings")
+    parser.add_argument("--similar-queries", action="store_true",
+                        help="reuse cached readings of near-identical questions asked with the same cards")
+    parser.add_argument("--tokens-per-minute", type=int, default=TOKENS_PER_MINUTE,
+                        help="token budget matching the API plan's limit; 0 turns it off")
+    args = parser.parse_args()
+    tarot_reading.similar_queries_enabled = args.similar_queries
+    token_accountant.set_tokens_per_minute(args.tokens_per_minute)
+    try:
+        asyncio.run(serve(args.host, args.port, not args.no_cache))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import threading
+
+# At most this many completion requests run against the API at once
+MAX_IN_FLIGHT = 2
+
+
+class ReadingExecutor:
+    # Runs reading jobs on a small pool of worker threads, for one or more
+    # sessions (reader windows; None when there is only one).
+    # Every submit() starts a new generation of its session. Jobs from older
+    # generations are dropped if they have not started yet, and jobs already
+    # running get an is_current() callable so they can stop early and discard
+    # their result.
+    #
+    # Only a session's newest job waits for a worker, and a free worker takes
+    # the waiting job of the session with the fewest jobs running (the one
+    # that has waited longest among those), so a window whose readings keep
+    # the workers busy cannot hold up the others.
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.dropped = 0
+        self._generations = {}
+        self._running = {}
+        # Session -> (generation, job), in the order the sessions started waiting
+        self._waiting = {}
+        self._cond = threading.Condition()
+        self._workers = []
+
+    def submit(self, job, session=None):
+        # job(is_current) is called on a worker thread
+        with self._cond:
+            token = self._generations.get(session, 0) + 1
+            self._generations[session] = token
+            if session in self._waiting:
+                # Superseded before it started: never hits the API. The new
+                # job keeps the place in line of the one it replaces
+                self.dropped += 1
+            self._waiting[session] = (token, job)
+            if len(self._workers) < self.max_in_flight:
+                worker = threading.Thread(target=self._work, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._cond.notify()
+        return token
+
+    def is_current(self, token, session=None):
+        return token == self._generations.get(session)
+
+    def close_session(self, session):
+        # For a window being closed: its waiting job is dropped and running
+        # ones see is_current() turn false
+        with self._cond:
+            self._generations.pop(session, None)
+            if self._waiting.pop(session, None) is not None:
+                self.dropped += 1
+
+    def _next_job(self):
+        with self._cond:
+            while not self._waiting:
+                self._cond.wait()
+            session = min(self._waiting, key=lambda waiting: self._running.get(waiting, 0))
+            token, job = self._waiting.pop(session)
+            self._running[session] = self._running.get(session, 0) + 1
+            self.in_flight += 1
+            return session, token, job
+
+    def _work(self):
+        while True:
+            session, token, job = self._next_job()
+            try:
+                job(lambda: self.is_current(token, session))
+            except Exception as e:
+                print(f"Error generating reading: {e}")
+            finally:
+                with self._cond:
+                    self.in_flight -= 1
+                    self._running[session] -= 1
+                    if not self._running[session]:
+                        del self._running[session]
+
+
+reading_executor = ReadingExecutor()
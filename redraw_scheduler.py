@@ -0,0 +1,56 @@
+import time
+
+# Roughly one frame at 60 Hz
+FRAME_INTERVAL_MS = 16
+
+
+class RedrawScheduler:
+    # Collapses bursts of <Configure> events into at most one redraw per frame.
+    # The first event of a burst schedules a redraw with after(); every event
+    # that arrives before it runs is absorbed into that same redraw.
+
+    def __init__(self, widget, redraw, interval_ms=FRAME_INTERVAL_MS):
+        self.widget = widget
+        self.redraw = redraw
+        self.interval_ms = interval_ms
+        self.request_count = 0
+        self.redraw_count = 0
+        self.redraw_seconds = 0.0
+        self._pending = None
+        self._drawn_size = None
+
+    def bind(self):
+        self.widget.bind("<Configure>", self.request)
+        self.widget.bind("<Destroy>", lambda event: self.cancel(), add="+")
+        return self
+
+    def request(self, event=None):
+        self.request_count += 1
+        if event is not None and (event.width, event.height) == self._drawn_size:
+            return
+        if self._pending is None:
+            self._pending = self.widget.after(self.interval_ms, self._run)
+
+    def flush(self, size=None):
+        # Redraw immediately, dropping any redraw that is still scheduled.
+        # size is for a widget not laid out yet, which still reports 1x1: the
+        # redraw is passed the (width, height) it is about to get, and the
+        # <Configure> to that size is skipped
+        self.cancel()
+        self._run(size)
+
+    def cancel(self):
+        if self._pending is not None:
+            self.widget.after_cancel(self._pending)
+            self._pending = None
+
+    def _run(self, size=None):
+        self._pending = None
+        start = time.perf_counter()
+        if size is None:
+            self.redraw()
+        else:
+            self.redraw(size)
+        self.redraw_seconds += time.perf_counter() - start
+        self.redraw_count += 1
+        self._drawn_size = size or (self.widget.winfo_width(), self.widget.winfo_height())
@@ -0,0 +1,264 @@
+# Coalesces identical requests that are in flight at the same time.
+#
+# The first caller for a key (the leader) makes the upstream call. Callers
+# that arrive with the same key before it finishes wait for its outcome, or
+# replay its stream from the start, instead of making a call of their own.
+# An error reaches every waiter. Nothing is kept once the call is over;
+# later repeats are the reading cache's business.
+#
+# Cancellation only ever affects the caller that cancels: a streamed call is
+# closed once every caller reading it has stopped, and an async call is
+# cancelled once every caller awaiting it has been cancelled.
+#
+# asyncio is imported by the async methods only, so the app can use the
+# blocking ones without loading it.
+import threading
+
+import metrics
+
+# Stand-in for "no chunk yet, this subscriber pulls the next one"
+_PULL = object()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Stream:
+    def __init__(self, open_stream):
+        self.open_stream = open_stream
+        self.upstream = None
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        # True while one subscriber is waiting on the upstream for the next chunk
+        self.pulling = False
+        self.subscribers = 0
+
+
+class _AsyncCall:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class _AsyncStream:
+    def __init__(self):
+        self.task = None
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.subscribers = 0
+        # asyncio.Event made by the first subscriber to wait for the next
+        # chunk; set and dropped when a chunk arrives or the stream ends
+        self.changed = None
+
+
+class SingleFlight:
+    def __init__(self, name):
+        # name labels the calls_saved metric
+        self.name = name
+        self.leaders = 0
+        self.saved = 0
+        self._calls = {}
+        self._streams = {}
+        self._async_calls = {}
+        self._async_streams = {}
+        self._cond = threading.Condition()
+
+    def _joined(self, labels):
+        with self._cond:
+            self.saved += 1
+        metrics.count(f"{self.name}_calls_saved_total", **labels)
+
+    def do(self, key, function, **labels):
+        # Returns function()'s result, calling it only if no identical call
+        # is already running
+        with self._cond:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+        if not leader:
+            self._joined(labels)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._cond:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key, open_stream, **labels):
+        # Yields every item of open_stream() (an iterable), opening it only if
+        # no identical stream is already running. Whichever subscriber is
+        # furthest along pulls the next item, so the stream keeps going when
+        # the leader stops reading; it is closed when every subscriber has.
+        with self._cond:
+            flight = self._streams.get(key)
+            if flight is None:
+                flight = self._streams[key] = _Stream(open_stream)
+                self.leaders += 1
+                joined = False
+            else:
+                joined = True
+            flight.subscribers += 1
+        if joined:
+            self._joined(labels)
+        position = 0
+        try:
+            while True:
+                with self._cond:
+                    while position == len(flight.chunks) and not flight.finished and flight.pulling:
+                        self._cond.wait()
+                    if position < len(flight.chunks):
+                        chunk = flight.chunks[position]
+                    elif flight.finished:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.pulling = True
+                        chunk = _PULL
+                if chunk is _PULL:
+                    self._pull(key, flight)
+                    continue
+                position += 1
+                yield chunk
+        finally:
+            with self._cond:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.finished
+                if abandoned and self._streams.get(key) is flight:
+                    del self._streams[key]
+            if abandoned and flight.upstream is not None:
+                close = getattr(flight.upstream, "close", None)
+                if close is not None:
+                    close()
+
+    def _pull(self, key, flight):
+        chunk = error = None
+        finished = False
+        try:
+            if flight.upstream is None:
+                flight.upstream = iter(flight.open_stream())
+            chunk = next(flight.upstream)
+        except StopIteration:
+            finished = True
+        except BaseException as e:
+            finished = True
+            error = e
+        with self._cond:
+            flight.pulling = False
+            if finished:
+                flight.finished = True
+                flight.error = error
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+            else:
+                flight.chunks.append(chunk)
+            self._cond.notify_all()
+
+    async def do_async(self, key, function, **labels):
+        # Awaits function() (a coroutine function), calling it only if no
+        # identical call is already running on this event loop
+        import asyncio
+        key = (asyncio.get_running_loop(), key)
+        call = self._async_calls.get(key)
+        if call is None:
+            call = self._async_calls[key] = _AsyncCall(asyncio.ensure_future(function()))
+            call.task.add_done_callback(lambda task: self._forget(self._async_calls, key, call))
+            with self._cond:
+                self.leaders += 1
+        else:
+            self._joined(labels)
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done() and call.waiters == 1:
+                # The last waiter is gone; later callers start afresh
+                self._forget(self._async_calls, key, call)
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    async def stream_async(self, key, open_stream, **labels):
+        # Async counterpart of stream(): open_stream() is an async iterable,
+        # pumped by a task of its own and cancelled when no one reads it
+        import asyncio
+        key = (asyncio.get_running_loop(), key)
+        flight = self._async_streams.get(key)
+        if flight is None:
+            flight = self._async_streams[key] = _AsyncStream()
+            flight.task = asyncio.ensure_future(self._pump(key, flight, open_stream))
+            with self._cond:
+                self.leaders += 1
+        else:
+            self._joined(labels)
+        flight.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(flight.chunks):
+                    position += 1
+                    yield flight.chunks[position - 1]
+                elif flight.finished:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                else:
+                    if flight.changed is None:
+                        flight.changed = asyncio.Event()
+                    await flight.changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.finished:
+                self._forget(self._async_streams, key, flight)
+                flight.task.cancel()
+
+    async def _pump(self, key, flight, open_stream):
+        # A cancelled pump (no one left reading) records no error
+        try:
+            async for chunk in open_stream():
+                flight.chunks.append(chunk)
+                self._changed(flight)
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.finished = True
+            self._forget(self._async_streams, key, flight)
+            self._changed(flight)
+
+    @staticmethod
+    def _forget(flights, key, flight):
+        # Drops the entry only if a newer call has not replaced it already
+        if flights.get(key) is flight:
+            del flights[key]
+
+    @staticmethod
+    def _changed(flight):
+        if flight.changed is not None:
+            flight.changed.set()
+            flight.changed = None
+
+    def stats(self):
+        with self._cond:
+            return {
+                "leaders": self.leaders,
+                "saved": self.saved,
+                "in_flight": len(self._calls) + len(self._streams)
+                + len(self._async_calls) + len(self._async_streams),
+            }
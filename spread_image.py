@@ -0,0 +1,191 @@
+# Renders a drawn spread to a single PNG or WebP image with PIL alone.
+#
+# Cards are placed by the same layout engine as the desktop canvas (so the
+# Celtic Cross crossing card is turned 90 degrees here too). Encoded images
+# are kept in an LRU cache keyed by spread, card order, size and format, and
+# many spreads can be rendered at once across a process pool for bulk export:
+#
+#   python spread_image.py --spread celtic --count 200 --size 1280x800 --format webp --out exports
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import io
+import os
+import threading
+import time
+
+from deck import deck
+from deck_assets import deck_assets
+from image_cache import rotate_image
+from layout import spread_layout
+import metrics
+from spreads import SPREADS
+from tarot_reading import draw_cards
+
+# PIL format name and save options for each output format
+FORMATS = {
+    "png": ("PNG", {}),
+    "webp": ("WEBP", {"quality": 90, "method": 4}),
+}
+CONTENT_TYPES = {"png": "image/png", "webp": "image/webp"}
+# Same grey as an empty Tk canvas
+BACKGROUND = (217, 217, 217)
+MAX_SIZE = 4096
+# Upper bound on the encoded images held by spread_images
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+# Large enough for every card at every rotation (0 or 90 degrees in the
+# layout, turned 180 more when reversed), plus the placeholder's, so a
+# Celtic Cross export does not keep evicting and reconverting cards
+@functools.lru_cache(maxsize=4 * len(deck) + 4)
+def _card_source(image_name, rotation):
+    # Card in RGBA (the GIFs use a transparent palette entry), rotated once
+    source = deck_assets.get(image_name).convert("RGBA")
+    if rotation:
+        source = rotate_image(source, rotation)
+    return source
+
+
+def render_spread(spread, image_names, width, height, reversed_flags=None):
+    # Returns a PIL image of the spread as it would appear on a canvas of
+    # this size. reversed_flags marks the cards drawn upside down.
+    from PIL import Image
+    if len(image_names) != spread.num_cards:
+        raise ValueError(f"{spread.name} takes {spread.num_cards} cards, got {len(image_names)}")
+    reversed_flags = reversed_flags or [False] * len(image_names)
+    canvas = Image.new("RGB", (width, height), BACKGROUND)
+    geometry = spread_layout(spread, width, height, deck_assets.card_size())
+    if geometry is None:
+        return canvas
+    for image_name, reversed_card, card in zip(image_names, reversed_flags, geometry.cards):
+        rotation = (card.rotation + 180) % 360 if reversed_card else card.rotation
+        card_image = _card_source(image_name, rotation).resize((card.width, card.height), Image.LANCZOS)
+        canvas.paste(card_image, (round(card.x), round(card.y)), card_image)
+    return canvas
+
+
+def encode(image, image_format):
+    pil_format, options = FORMATS[image_format]
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def check_request(spread_name, width, height, image_format):
+    # Raises ValueError with a message fit for an API client
+    if spread_name not in SPREADS:
+        raise ValueError(f"unknown spread {spread_name!r}, expected one of {sorted(SPREADS)}")
+    if image_format not in FORMATS:
+        raise ValueError(f"unknown format {image_format!r}, expected one of {sorted(FORMATS)}")
+    if not (1 <= width <= MAX_SIZE and 1 <= height <= MAX_SIZE):
+        raise ValueError(f"width and height must be between 1 and {MAX_SIZE}")
+
+
+class SpreadImageCache:
+    # LRU cache of encoded spread images keyed by
+    # (spread, card image names in order, reversed cards, width, height, format)
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, spread_name, image_names, width, height, image_format="png", reversed_flags=None):
+        check_request(spread_name, width, height, image_format)
+        reversed_flags = tuple(bool(flag) for flag in reversed_flags or [False] * len(image_names))
+        key = (spread_name, tuple(image_names), reversed_flags, width, height, image_format)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.count("spread_image_cache_hits_total")
+                return data
+            self.misses += 1
+        metrics.count("spread_image_cache_misses_total")
+        with metrics.span("spread_image_render", spread=spread_name, format=image_format):
+            data = encode(
+                render_spread(SPREADS[spread_name], image_names, width, height, reversed_flags), image_format
+            )
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = data
+                self.current_bytes += len(data)
+                self._evict()
+        return data
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, data = self._entries.popitem(last=False)
+            self.current_bytes -= len(data)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+spread_images = SpreadImageCache()
+
+
+def _render_job(job):
+    # Runs in a pool worker, which has its own deck_assets and cache
+    spread_name, image_names, reversed_flags, width, height, image_format = job
+    return spread_images.get(spread_name, image_names, width, height, image_format, reversed_flags)
+
+
+def export_spreads(jobs, output_dir, processes=None):
+    # jobs: (spread name, card image names, reversed flags, width, height,
+    # format) tuples.
+    # Writes one file per job and returns the paths in job order.
+    jobs = list(jobs)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    processes = processes or os.cpu_count() or 1
+    # A few chunks per worker keeps them busy without one IPC round trip per image
+    chunksize = max(len(jobs) // (4 * processes), 1)
+    with ProcessPoolExecutor(processes) as pool:
+        for index, (job, data) in enumerate(zip(jobs, pool.map(_render_job, jobs, chunksize=chunksize))):
+            spread_name, _, _, width, height, image_format = job
+            path = os.path.join(output_dir, f"{index:05d}-{spread_name}-{width}x{height}.{image_format}")
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+    return paths
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render random spreads to image files")
+    parser.add_argument("--spread", default="three", choices=sorted(SPREADS))
+    parser.add_argument("--count", type=int, default=1, help="spreads to draw and render")
+    parser.add_argument("--size", type=parse_size, default=(1280, 800), help="WIDTHxHEIGHT")
+    parser.add_argument("--format", default="png", choices=sorted(FORMATS))
+    parser.add_argument("--out", default="exports", help="output directory")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    spread = SPREADS[args.spread]
+    jobs = []
+    for _ in range(args.count):
+        cards = draw_cards(spread.num_cards)
+        jobs.append((
+            spread.name, [card.image for card in cards], [card.reversed for card in cards], *args.size, args.format
+        ))
+    start = time.perf_counter()
+    paths = export_spreads(jobs, args.out, args.processes)
+    elapsed = time.perf_counter() - start
+    print(f"rendered {len(paths)} spreads to {args.out} in {elapsed:.2f}s ({len(paths) / elapsed:.1f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import string
+
+# Shared tail of every reading prompt
+STYLE_RULES = (
+    "Do not reference the client directly. Do not use 'you', 'your', or 'the querent' in the reading. "
+)
+START_RULES = (
+    "Do not include any introductory phrases or acknowledgements. "
+    "Start the reading directly and ensure it relates to the question if one is provided."
+)
+# Added only when a card was drawn reversed, so upright prompts are unchanged
+REVERSAL_RULES = " Cards marked (reversed) were drawn upside down; interpret them with their reversed meanings."
+
+
+class Spread:
+    # One spread type: how many cards, what each position is called, how the
+    # prompt is worded and which canvas layout draws it.
+    #
+    # The static parts of the prompt are assembled once here, so building a
+    # prompt per request is only joining the query and card names into them.
+
+    def __init__(self, name, label, positions, intro, instructions, layout,
+                 card_format="$position: $name", card_separator="\n", card_list_end="", rotations=None):
+        self.name = name
+        # Button text in the desktop app
+        self.label = label
+        self.positions = list(positions)
+        self.num_cards = len(self.positions)
+        # Key of the geometry that lays this spread out (see layout.LAYOUTS)
+        self.layout = layout
+        # Degrees to rotate the card at each position, e.g. the crossing card
+        self.rotations = dict(rotations or {})
+        self.rotation_list = tuple(self.rotations.get(i, 0) for i in range(self.num_cards))
+        self._intro = f"\n\n{intro}\n\n"
+        self._instructions = f"{card_list_end}\n\n{instructions}"
+        self._card_separator = card_separator
+        # Each card line is split around its name into a fixed prefix and suffix
+        self._card_slots = []
+        for number, position in enumerate(self.positions, 1):
+            line = string.Template(card_format).safe_substitute(position=position, number=number)
+            prefix, _, suffix = line.partition("$name")
+            self._card_slots.append((prefix, suffix))
+
+    def build_prompt(self, cards, query):
+        # Include the user's query in the prompt without referencing "the querent"
+        query = query.strip()
+        if query:
+            query_text = f"The following question is considered: '{query}'."
+        else:
+            query_text = "No specific question is provided."
+        card_lines = self._card_separator.join(
+            [prefix + card.display_name + suffix for (prefix, suffix), card in zip(self._card_slots, cards)]
+        )
+        prompt = query_text + self._intro + card_lines + self._instructions
+        for card in cards:
+            if card.reversed:
+                return prompt + REVERSAL_RULES
+        return prompt
+
+    def card_rotations(self, cards):
+        # Degrees each drawn card is turned: its position's rotation, plus
+        # half a turn when it came up reversed
+        return [
+            (rotation + 180) % 360 if card.reversed else rotation
+            for rotation, card in zip(self.rotation_list, cards)
+        ]
+
+    def card_meanings(self, cards):
+        return "\n".join(
+            [f"{position}:\n{card.display_name} - {card.meaning}\n" for position, card in zip(self.positions, cards)]
+        )
+
+
+# Registered spreads in the order their draw buttons are shown
+SPREADS = {}
+# Ad-hoc spreads for card counts that have no registered spread
+_generic_spreads = {}
+
+
+def register_spread(spread):
+    SPREADS[spread.name] = spread
+    return spread
+
+
+def spread_for_cards(cards):
+    # Fallback for card lists that come without their spread: the first
+    # registered spread with that many cards, or an ad-hoc one
+    for spread in SPREADS.values():
+        if spread.num_cards == len(cards):
+            return spread
+    num_cards = len(cards)
+    spread = _generic_spreads.get(num_cards)
+    if spread is None:
+        spread = _generic_spreads[num_cards] = Spread(
+            name=f"{num_cards}-card",
+            label=f"Draw {num_cards} Cards",
+            positions=[f"Card {i + 1}" for i in range(num_cards)],
+            intro="Provide a reading based on the following cards:",
+            instructions=(
+                f"Interpret the cards as appropriate for a {num_cards}-card spread, without assigning "
+                "specific positions or standard meanings to each card. " + STYLE_RULES + START_RULES
+            ),
+            layout="row",
+            card_format="$name",
+            card_separator=", ",
+            card_list_end=".",
+        )
+    return spread
+
+
+register_spread(Spread(
+    name="one",
+    label="Draw One Card",
+    positions=["Card"],
+    intro="Provide a reading based on the following card:",
+    instructions=(
+        "Interpret the card without referencing the client directly. Do not use 'you', 'your', or "
+        "'the querent' in the reading. Do not assign specific positions or standard meanings to the card. "
+        + START_RULES
+    ),
+    layout="single",
+    card_format="$name",
+    card_list_end=".",
+))
+
+register_spread(Spread(
+    name="three",
+    label="Draw Three Cards",
+    positions=["Card 1", "Card 2", "Card 3"],
+    intro="Provide a reading based on the following cards:",
+    instructions=(
+        "Provide an interpretation for each card individually, without assigning specific positions or "
+        "standard meanings to each card, **and then give an overall interpretation at the end that ties "
+        "all the insights together**. " + STYLE_RULES + START_RULES
+    ),
+    layout="row",
+))
+
+register_spread(Spread(
+    name="celtic",
+    label="Draw Celtic Cross",
+    positions=[
+        "Present Situation (1)",
+        "Influences or Challenges (2)",
+        "Distant Past (3)",
+        "Recent Past (4)",
+        "Best Outcome (5)",
+        "Immediate Future (6)",
+        "Advice (7)",
+        "Environment (8)",
+        "Hopes or Fears (9)",
+        "Potential Outcome (10)",
+    ],
+    intro="Provide a Celtic Cross reading based on the following cards and their positions:",
+    instructions=(
+        "Associate each card with its position using the exact position names provided. Provide an "
+        "interpretation for each card in its position, and then give an overall interpretation at the end "
+        "that ties all the insights together. " + STYLE_RULES
+        + "Do not change the position names or numbering. " + START_RULES
+    ),
+    layout="celtic_cross",
+    rotations={1: 90},
+))
+
+# An example of a spread defined on top of the registry; not registered, so
+# the app has no button for it and 5-card lists keep the generic prompt.
+# register_spread(HORSESHOE) adds it everywhere, with no other code changes
+HORSESHOE = Spread(
+    name="horseshoe",
+    label="Draw Horseshoe",
+    positions=[
+        "Past (1)",
+        "Present (2)",
+        "Hidden Influences (3)",
+        "Obstacles (4)",
+        "Outcome (5)",
+    ],
+    intro="Provide a Horseshoe reading based on the following cards and their positions:",
+    instructions=(
+        "Associate each card with its position using the exact position names provided. Provide an "
+        "interpretation for each card in its position, and then give an overall interpretation at the end "
+        "that ties all the insights together. " + STYLE_RULES
+        + "Do not change the position names or numbering. " + START_RULES
+    ),
+    layout="row",
+)
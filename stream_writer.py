@@ -0,0 +1,44 @@
+import threading
+import tkinter as tk
+
+# How often buffered chunks are flushed into the text box
+FLUSH_INTERVAL_MS = 50
+
+
+class TextStreamWriter:
+    # Appends streamed text to a read-only Text widget in batches.
+    # write() may be called from any thread; chunks are buffered and flushed
+    # on the Tk main thread at most once per FLUSH_INTERVAL_MS, so a fast
+    # stream does not flood the event loop with one insert per token.
+
+    def __init__(self, text_box, interval_ms=FLUSH_INTERVAL_MS, is_current=None):
+        self.text_box = text_box
+        self.interval_ms = interval_ms
+        # Returns False once a newer reading owns the text box
+        self.is_current = is_current
+        self._chunks = []
+        self._lock = threading.Lock()
+        self._scheduled = False
+
+    def write(self, chunk):
+        with self._lock:
+            self._chunks.append(chunk)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.text_box.after(self.interval_ms, self._flush)
+
+    def _flush(self):
+        with self._lock:
+            text = "".join(self._chunks)
+            self._chunks.clear()
+            self._scheduled = False
+        if not text or (self.is_current is not None and not self.is_current()):
+            return
+        try:
+            self.text_box.config(state="normal")
+            self.text_box.insert(tk.END, text)
+            self.text_box.config(state="disabled")
+        except tk.TclError:
+            # The window was closed while the reading was still streaming
+            pass
@@ -0,0 +1,404 @@
+import logging
+import os
+import random
+import threading
+import time
+
+from deck import deck
+from llm_transport import LLMTransport, NO_CLIENT, ReadingError, ReadingResult
+import metrics
+from query_index import QueryIndex
+from reading_cache import cache_key, reading_cache
+from single_flight import SingleFlight
+from spreads import SPREADS, spread_for_cards
+from token_accounting import MAX_TOKENS, token_accountant
+
+logger = logging.getLogger(__name__)
+
+# Set your Groq API key
+groq_api_key = 'REPLACE_THIS_WITH_YOUR_GROQ_API_KEY'  # Replace with your actual Groq API key (within the apostrophes)
+model_name = "llama-3.1-70b-versatile"  # Replace with your desired Llama model
+
+# The Groq client is built on first use (or by warm_up_client) rather than
+# at import time: importing groq takes far longer than showing the window
+client = None
+groq_available = None  # Not known until get_client() has run
+_client_lock = threading.Lock()
+
+def get_client():
+    global client, groq_available
+    with _client_lock:
+        if groq_available is not None:
+            return client
+        # Try to import Groq and set up the client if available
+        if os.environ.get("TAROT_FAKE_LLM"):
+            # Offline mode: canned readings from a local fake client
+            from fake_llm import FakeGroq
+            client = FakeGroq()
+            groq_available = True
+        else:
+            try:
+                from groq import Groq
+
+                client = Groq(
+                    api_key=groq_api_key,
+                    base_url=os.environ.get("TAROT_LLM_BASE_URL"),
+                    max_retries=0,
+                )
+                groq_available = True
+            except ImportError:
+                groq_available = False
+                client = None
+        return client
+
+def warm_up_client():
+    # Import groq and build the client in the background
+    threading.Thread(target=get_client, daemon=True).start()
+
+# httpx closes idle pooled connections after 5 seconds, so a connection
+# opened more recently than this is assumed to still be open
+WARM_UP_INTERVAL = 4
+_last_warm_up = 0.0
+
+def _open_connection():
+    client = get_client()
+    models = getattr(client, "models", None)
+    if models is None:
+        return
+    try:
+        # The cheapest authenticated call; it leaves a TLS connection to the
+        # API in the client's pool for the next completion to reuse
+        models.list(timeout=5)
+    except Exception as e:
+        logger.debug("connection warm-up failed: %s", e)
+
+def warm_up_connection():
+    # Called when a reading is likely to follow soon (e.g. the pointer moving
+    # onto a draw button), so its request skips the DNS, TCP and TLS setup
+    global _last_warm_up
+    now = time.monotonic()
+    if now - _last_warm_up < WARM_UP_INTERVAL:
+        return
+    _last_warm_up = now
+    threading.Thread(target=_open_connection, daemon=True).start()
+
+# One async client is shared by every batch and server request so they all
+# draw from the same HTTP connection pool
+async_client = None
+MAX_CONNECTIONS = 64
+
+def get_async_client():
+    global async_client
+    if async_client is None:
+        if os.environ.get("TAROT_FAKE_LLM"):
+            from fake_llm import AsyncFakeGroq
+            async_client = AsyncFakeGroq()
+        else:
+            import httpx
+            from groq import AsyncGroq
+            limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+            # Retries are handled by the transport so they can be counted and bounded
+            async_client = AsyncGroq(
+                api_key=groq_api_key,
+                base_url=os.environ.get("TAROT_LLM_BASE_URL"),
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=limits),
+            )
+    return async_client
+
+# Timeouts, retries and the circuit breaker for every completion call
+transport = LLMTransport(get_client, get_async_client)
+
+def resolve_spread(cards, spread=None):
+    # The spread a reading is for: a Spread, the name of a registered one, or
+    # None to go by the number of cards (for ad-hoc card lists)
+    if spread is None:
+        return spread_for_cards(cards)
+    if isinstance(spread, str):
+        if spread not in SPREADS:
+            raise ValueError(f"unknown spread {spread!r}")
+        spread = SPREADS[spread]
+    if spread.num_cards != len(cards):
+        raise ValueError(f"{spread.name} takes {spread.num_cards} cards, got {len(cards)}")
+    return spread
+
+def spread_name(cards, spread=None):
+    return resolve_spread(cards, spread).name
+
+def build_tarot_prompt(cards, query, spread=None):
+    return resolve_spread(cards, spread).build_prompt(cards, query)
+
+def completion_params(prompt, stream=False, max_tokens=MAX_TOKENS):
+    return dict(
+        messages=[
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ],
+        model=model_name,
+        max_tokens=max_tokens,
+        temperature=0.6, ## Adjusts how "creative" the readings are.
+        stream=stream
+    )
+
+def record_usage(spread, usage):
+    # Token counts reported by the API; streamed completions carry them on
+    # the last chunk (under x_groq for Groq)
+    if usage is None:
+        return
+    metrics.count("llm_tokens_in_total", getattr(usage, "prompt_tokens", 0) or 0, spread=spread)
+    metrics.count("llm_tokens_out_total", getattr(usage, "completion_tokens", 0) or 0, spread=spread)
+
+def chunk_usage(chunk):
+    usage = getattr(chunk, "usage", None)
+    if usage is None:
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+    return usage
+
+def account_completion(tokens, completion):
+    # Hands a blocking completion's usage to its token reservation
+    choice = completion.choices[0]
+    tokens.usage = getattr(completion, "usage", None)
+    tokens.finish_reason = getattr(choice, "finish_reason", None)
+    tokens.parts.append(choice.message.content)
+
+def account_chunk(tokens, chunk):
+    usage = chunk_usage(chunk)
+    if usage is not None:
+        tokens.usage = usage
+    if chunk.choices and getattr(chunk.choices[0], "finish_reason", None):
+        tokens.finish_reason = chunk.choices[0].finish_reason
+    return usage
+
+def retry_hook(on_retry):
+    # A 429 pauses the token budget as well as whatever the caller does
+    if on_retry is None:
+        return token_accountant.on_error
+
+    def hook(error):
+        token_accountant.on_error(error)
+        on_retry(error)
+    return hook
+
+# Identical readings requested while one is already being generated share
+# its completion; saved calls are counted as llm_calls_saved_total
+in_flight = SingleFlight("llm")
+
+def card_keys(cards):
+    # Reading cache key parts; reversed cards get their own readings
+    return [card.display_name for card in cards]
+
+# Reuse the reading of an earlier question that is a near-paraphrase of the
+# new one and was asked with the same cards (see query_index); off by default
+similar_queries_enabled = False
+query_index = None
+_query_index_lock = threading.Lock()
+
+def get_query_index():
+    # Built from the reading cache on first use
+    global query_index
+    with _query_index_lock:
+        if query_index is None:
+            index = QueryIndex()
+            for spread, card_names, query in reading_cache.entries():
+                index.add((spread, tuple(card_names)), query)
+            query_index = index
+        return query_index
+
+def cached_reading(spread, card_names, query):
+    reading = reading_cache.get(spread, card_names, query)
+    if reading is not None or not similar_queries_enabled:
+        return reading
+    scope = (spread, tuple(card_names))
+    match = get_query_index().find(scope, query)
+    if match is None:
+        return None
+    reading = reading_cache.get(spread, card_names, match[0])
+    if reading is None:
+        # Expired or evicted from the cache since it was indexed
+        get_query_index().discard(scope, match[0])
+        return None
+    metrics.count("similar_query_hits_total", spread=spread)
+    return reading
+
+def store_reading(spread, card_names, query, reading):
+    reading_cache.put(spread, card_names, query, reading)
+    # An index not built yet will pick the reading up from the cache
+    if query_index is not None:
+        query_index.add((spread, tuple(card_names)), query)
+
+async def _off_loop(function, *args):
+    # The cache is SQLite on disk and the first similar-query lookup builds
+    # the index from all of it, so the async paths run them on the default
+    # executor rather than blocking the server's event loop. asyncio is
+    # imported here to keep it out of the app's startup
+    import asyncio
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+def generate_tarot_reading(cards, query, spread=None):
+    # Returns a ReadingResult; on failure its error says what went wrong.
+    # spread is a Spread or the name of a registered one; without it the
+    # spread is looked up by the number of cards
+    start = time.perf_counter()
+    spread = resolve_spread(cards, spread)
+    name = spread.name
+    card_names = card_keys(cards)
+    cached = cached_reading(name, card_names, query)
+    if cached is not None:
+        return ReadingResult(cached, latency=time.perf_counter() - start, cached=True)
+
+    def complete():
+        prompt = spread.build_prompt(cards, query)
+        with token_accountant.reading(name, len(cards), prompt) as tokens:
+            with metrics.span("llm_reading", spread=name, mode="blocking"):
+                chat_completion = transport.complete(
+                    completion_params(prompt, max_tokens=tokens.max_tokens), token_accountant.on_error
+                )
+            account_completion(tokens, chat_completion)
+        reading = chat_completion.choices[0].message.content.strip()
+        record_usage(name, getattr(chat_completion, "usage", None))
+        store_reading(name, card_names, query, reading)
+        return reading
+
+    try:
+        reading = in_flight.do(cache_key(name, card_names, query), complete, spread=name, mode="blocking")
+    except ReadingError as e:
+        if e.kind != NO_CLIENT:
+            logger.warning("reading failed (%s): %s", e.kind, e.message)
+        metrics.count("llm_failures_total", spread=name, kind=e.kind)
+        return ReadingResult(error=e, latency=time.perf_counter() - start)
+    return ReadingResult(reading, latency=time.perf_counter() - start)
+
+def _stream_reading(cards, query, spread, card_names):
+    name = spread.name
+    start = time.perf_counter()
+    prompt = spread.build_prompt(cards, query)
+    with token_accountant.reading(name, len(cards), prompt) as tokens, \
+            metrics.span("llm_reading", spread=name, mode="stream"):
+        chunks = tokens.parts
+        params = completion_params(prompt, stream=True, max_tokens=tokens.max_tokens)
+        for chunk in transport.stream(params, token_accountant.on_error):
+            record_usage(name, account_chunk(tokens, chunk))
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if not content:
+                continue
+            if not chunks:
+                content = content.lstrip()
+                if not content:
+                    continue
+                time_to_first_token = time.perf_counter() - start
+                metrics.observe("llm_time_to_first_token_seconds", time_to_first_token, spread=name)
+                logger.info("time to first token (%s spread): %.3fs", name, time_to_first_token)
+            chunks.append(content)
+            yield content
+    # Only complete readings are cached, not ones every reader abandoned
+    if chunks:
+        store_reading(name, card_names, query, "".join(chunks).rstrip())
+
+def stream_tarot_reading(cards, query, spread=None):
+    # Yields the reading in chunks as the completion streams in. Failures are
+    # raised as ReadingError, possibly after some chunks were already yielded
+    spread = resolve_spread(cards, spread)
+    name = spread.name
+    card_names = card_keys(cards)
+    cached = cached_reading(name, card_names, query)
+    if cached is not None:
+        yield cached
+        return
+    yield from in_flight.stream(
+        cache_key(name, card_names, query),
+        lambda: _stream_reading(cards, query, spread, card_names),
+        spread=name,
+        mode="stream",
+    )
+
+async def generate_tarot_reading_async(cards, query, use_cache=True, on_retry=None, spread=None):
+    # Unlike generate_tarot_reading, failures are raised as ReadingError.
+    # use_cache=False asks for a fresh completion, so it is not shared either
+    spread = resolve_spread(cards, spread)
+    name = spread.name
+    card_names = card_keys(cards)
+    if use_cache:
+        cached = await _off_loop(cached_reading, name, card_names, query)
+        if cached is not None:
+            return cached
+
+    async def complete():
+        prompt = spread.build_prompt(cards, query)
+        async with token_accountant.reading_async(name, len(cards), prompt) as tokens:
+            params = completion_params(prompt, max_tokens=tokens.max_tokens)
+            with metrics.span("llm_reading", spread=name, mode="async"):
+                chat_completion = await transport.complete_async(params, retry_hook(on_retry))
+            account_completion(tokens, chat_completion)
+        record_usage(name, getattr(chat_completion, "usage", None))
+        reading = chat_completion.choices[0].message.content.strip()
+        if use_cache:
+            await _off_loop(store_reading, name, card_names, query, reading)
+        return reading
+
+    if not use_cache:
+        return await complete()
+    return await in_flight.do_async(cache_key(name, card_names, query), complete, spread=name, mode="async")
+
+async def _stream_reading_async(cards, query, spread, card_names, use_cache):
+    name = spread.name
+    prompt = spread.build_prompt(cards, query)
+    async with token_accountant.reading_async(name, len(cards), prompt) as tokens:
+        chunks = tokens.parts
+        params = completion_params(prompt, stream=True, max_tokens=tokens.max_tokens)
+        async for chunk in transport.stream_async(params, token_accountant.on_error):
+            record_usage(name, account_chunk(tokens, chunk))
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if not content:
+                continue
+            if not chunks:
+                content = content.lstrip()
+                if not content:
+                    continue
+            chunks.append(content)
+            yield content
+    if use_cache and chunks:
+        await _off_loop(store_reading, name, card_names, query, "".join(chunks).rstrip())
+
+async def stream_tarot_reading_async(cards, query, use_cache=True, spread=None):
+    spread = resolve_spread(cards, spread)
+    name = spread.name
+    card_names = card_keys(cards)
+    if use_cache:
+        cached = await _off_loop(cached_reading, name, card_names, query)
+        if cached is not None:
+            yield cached
+            return
+    if not use_cache:
+        async for chunk in _stream_reading_async(cards, query, spread, card_names, use_cache):
+            yield chunk
+        return
+    async for chunk in in_flight.stream_async(
+        cache_key(name, card_names, query),
+        lambda: _stream_reading_async(cards, query, spread, card_names, use_cache),
+        spread=name,
+        mode="stream_async",
+    ):
+        yield chunk
+
+_system_random = random.SystemRandom()
+# Each drawn card comes up reversed with even odds; False draws every card upright
+reversals_enabled = True
+
+@metrics.timed("draw_cards")
+def draw_cards(num_cards, reversals=None):
+    # Picks num_cards distinct cards in random order without copying and
+    # shuffling the whole deck; see deck_sampler for batched draws
+    cards = _system_random.sample(deck.cards, num_cards)
+    if reversals is None:
+        reversals = reversals_enabled
+    if not reversals:
+        return cards
+    # One random bit per card decides its orientation
+    flags = _system_random.getrandbits(num_cards)
+    reversed_cards = deck.reversed_cards
+    return [reversed_cards[card.id] if flags >> i & 1 else card for i, card in enumerate(cards)]
@@ -0,0 +1,346 @@
+# Token accounting for completion calls: how big a prompt is, how many
+# tokens each spread's readings actually take, and a per-minute budget that
+# holds requests back instead of letting the API answer them with a 429.
+#
+# Every reading runs inside token_accountant.reading(spread, num_cards, prompt):
+# that reserves the prompt estimate plus the spread's max_tokens from the budget
+# (waiting for it if need be), and once the reading is over gives back what
+# it did not use, going by the usage the API reports.
+#
+# max_tokens starts from a prior that grows with the number of cards and,
+# once a spread has MIN_SAMPLES readings, follows the longest recent ones
+# with some headroom. A reading cut off at max_tokens raises the spread's
+# budget straight away.
+from collections import deque
+import contextlib
+import math
+import re
+import threading
+import time
+
+from llm_transport import RATE_LIMITED, ReadingError
+import metrics
+
+# Match this to the tokens-per-minute limit of the API plan; None turns the
+# budget off
+TOKENS_PER_MINUTE = 6000
+# Longest a reading at the head of the budget queue waits out a pause after
+# a 429 before it fails as rate limited. Waiting for the bucket to refill is
+# never cut short: that only defers the reading.
+MAX_BUDGET_WAIT = 30
+# Seconds to hold all requests after a 429 that did not say how long to wait
+RATE_LIMIT_PAUSE = 5
+
+# Upper bound on max_tokens, and what every request asked for before
+MAX_TOKENS = 5000
+MIN_MAX_TOKENS = 256
+# Prior max_tokens: PRIOR_BASE_TOKENS plus PRIOR_TOKENS_PER_CARD per card
+PRIOR_BASE_TOKENS = 1024
+PRIOR_TOKENS_PER_CARD = 256
+# Completion lengths remembered per spread, and how many are needed before
+# they replace the prior
+SAMPLES_KEPT = 200
+MIN_SAMPLES = 20
+# max_tokens is this much above the 99th percentile completion
+HEADROOM = 1.25
+
+# Tokens the chat template adds around one user message
+CHAT_OVERHEAD = 8
+# Upper bounds for the tokens-per-reading histograms
+TOKEN_BUCKETS = (128, 256, 512, 1024, 1536, 2048, 3072, 4096, 6144, 8192)
+
+# Roughly how the Llama 3 tokenizer splits text before merging: contractions,
+# runs of letters, up to three digits, runs of punctuation, line breaks
+_PIECES = re.compile(r"'(?:s|t|re|ve|m|ll|d)|[^\W\d_]+|\d{1,3}|[^\w\s]+|\n+")
+
+
+def estimate_tokens(text):
+    # Common words are one token; long or rare ones are split about every
+    # six letters
+    return sum(1 + (len(piece) - 1) // 6 for piece in _PIECES.findall(text))
+
+
+class TokenBudget:
+    # A token bucket holding at most tokens_per_minute tokens, refilled
+    # continuously over period seconds. Thread-safe; acquire_async() may be
+    # used from event loops. Requests are granted in the order they asked, so
+    # a big reservation is not starved by small ones slipping past it.
+
+    # How often async waiters look again (they cannot wait on the condition)
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, tokens_per_minute, period=60):
+        self.capacity = tokens_per_minute
+        self.period = period
+        self.available = float(tokens_per_minute)
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._queue = deque()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self.available = min(self.capacity, self.available + (now - start) * self.capacity / self.period)
+        self._updated = now
+
+    def _take(self, tokens):
+        # Takes the tokens and returns 0, or returns the seconds until they
+        # will be there
+        now = time.monotonic()
+        self._refill(now)
+        if now >= self._paused_until and self.available >= tokens:
+            self.available -= tokens
+            return 0.0
+        start = max(now, self._paused_until)
+        return start - now + max(tokens - self.available, 0) * self.period / self.capacity
+
+    def _check_pause(self, deadline):
+        # Only a pause after a 429 that outlasts the deadline fails a request
+        if self._paused_until > deadline:
+            retry_after = self._paused_until - time.monotonic()
+            raise ReadingError(RATE_LIMITED, "token budget paused after a rate limit", True, retry_after=retry_after)
+
+    def _try(self, ticket, tokens, deadline, timeout):
+        # With the lock held: (seconds to wait, deadline). The deadline starts
+        # when the ticket reaches the head of the queue
+        if self._queue[0] is not ticket:
+            return None, deadline
+        if deadline is None:
+            deadline = time.monotonic() + timeout
+        wait = self._take(tokens)
+        if wait:
+            self._check_pause(deadline)
+        return wait, deadline
+
+    def _done(self, ticket, start, waited):
+        # With the lock held
+        self._queue.remove(ticket)
+        self._cond.notify_all()
+        if waited:
+            self.waits += 1
+            self.wait_seconds += time.monotonic() - start
+
+    def acquire(self, tokens, timeout=MAX_BUDGET_WAIT):
+        # Returns the tokens taken: a reservation bigger than the whole bucket
+        # takes a full bucket
+        tokens = min(tokens, self.capacity)
+        start = time.monotonic()
+        ticket = object()
+        deadline = None
+        waited = False
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    wait, deadline = self._try(ticket, tokens, deadline, timeout)
+                    if wait == 0:
+                        break
+                    waited = True
+                    self._cond.wait(wait)
+            finally:
+                self._done(ticket, start, waited)
+        if waited:
+            metrics.observe("llm_token_budget_wait_seconds", time.monotonic() - start)
+        return tokens
+
+    async def acquire_async(self, tokens, timeout=MAX_BUDGET_WAIT):
+        # asyncio is imported here so the app's startup does not load it
+        import asyncio
+        tokens = min(tokens, self.capacity)
+        start = time.monotonic()
+        ticket = object()
+        deadline = None
+        waited = False
+        with self._cond:
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    wait, deadline = self._try(ticket, tokens, deadline, timeout)
+                if wait == 0:
+                    break
+                waited = True
+                await asyncio.sleep(self.POLL_INTERVAL if wait is None else min(wait, self.POLL_INTERVAL * 4))
+        finally:
+            with self._cond:
+                self._done(ticket, start, waited)
+        if waited:
+            metrics.observe("llm_token_budget_wait_seconds", time.monotonic() - start)
+        return tokens
+
+    def refund(self, tokens):
+        # Negative to charge tokens used beyond the reservation
+        with self._cond:
+            self._refill(time.monotonic())
+            self.available = min(self.capacity, self.available + tokens)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        # After a 429: grant nothing for this long, then refill from empty
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            self.available = min(self.available, 0.0)
+            self._paused_until = max(self._paused_until, now + seconds)
+
+
+class Reservation:
+    # One reading's share of the budget. The caller fills in usage (as the
+    # API reports it) and the finish reason, and adds the text to parts as it
+    # arrives; the text is only used to estimate usage the API did not report.
+
+    def __init__(self, spread, prompt_estimate, raw_prompt_estimate, max_tokens):
+        self.spread = spread
+        self.prompt_estimate = prompt_estimate
+        self.raw_prompt_estimate = raw_prompt_estimate
+        self.max_tokens = max_tokens
+        self.reserved = prompt_estimate + max_tokens
+        self.usage = None
+        self.parts = []
+        self.finish_reason = None
+
+
+class _SpreadTokens:
+    def __init__(self, num_cards):
+        self.num_cards = num_cards
+        self.completions = deque(maxlen=SAMPLES_KEPT)
+        self.readings = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.truncated = 0
+        # Raised when a reading is cut off at max_tokens
+        self.floor = 0
+
+
+class TokenAccountant:
+    def __init__(self, tokens_per_minute=TOKENS_PER_MINUTE, max_wait=MAX_BUDGET_WAIT):
+        self.budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+        self.max_wait = max_wait
+        # Reported prompt tokens per estimated one, learned from usage
+        self.prompt_ratio = 1.0
+        self._spreads = {}
+        self._lock = threading.Lock()
+
+    def set_tokens_per_minute(self, tokens_per_minute):
+        self.budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+
+    def _spread(self, spread, num_cards):
+        stats = self._spreads.get(spread)
+        if stats is None:
+            stats = self._spreads[spread] = _SpreadTokens(num_cards)
+        return stats
+
+    def estimate_prompt(self, prompt):
+        return math.ceil((estimate_tokens(prompt) + CHAT_OVERHEAD) * self.prompt_ratio)
+
+    def max_tokens(self, spread, num_cards):
+        with self._lock:
+            stats = self._spread(spread, num_cards)
+            if len(stats.completions) >= MIN_SAMPLES:
+                ordered = sorted(stats.completions)
+                longest = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+                budget = math.ceil(longest * HEADROOM)
+            else:
+                budget = PRIOR_BASE_TOKENS + PRIOR_TOKENS_PER_CARD * num_cards
+            return min(max(budget, stats.floor, MIN_MAX_TOKENS), MAX_TOKENS)
+
+    def _reserve(self, spread, num_cards, prompt):
+        raw = estimate_tokens(prompt) + CHAT_OVERHEAD
+        return Reservation(spread, math.ceil(raw * self.prompt_ratio), raw, self.max_tokens(spread, num_cards))
+
+    @contextlib.contextmanager
+    def reading(self, spread, num_cards, prompt):
+        # Waits its turn for the budget; raises ReadingError (rate limited)
+        # only if a pause after a 429 would hold it past max_wait
+        reservation = self._reserve(spread, num_cards, prompt)
+        if self.budget is not None:
+            reservation.reserved = self.budget.acquire(reservation.reserved, self.max_wait)
+        try:
+            yield reservation
+        except BaseException as e:
+            if isinstance(e, ReadingError):
+                self.on_error(e)
+            self._settle(reservation, complete=False)
+            raise
+        self._settle(reservation, complete=True)
+
+    @contextlib.asynccontextmanager
+    async def reading_async(self, spread, num_cards, prompt):
+        reservation = self._reserve(spread, num_cards, prompt)
+        if self.budget is not None:
+            reservation.reserved = await self.budget.acquire_async(reservation.reserved, self.max_wait)
+        try:
+            yield reservation
+        except BaseException as e:
+            if isinstance(e, ReadingError):
+                self.on_error(e)
+            self._settle(reservation, complete=False)
+            raise
+        self._settle(reservation, complete=True)
+
+    def on_error(self, error):
+        # Passed to the transport as on_retry (and called for the error a
+        # reading finally fails with) so a 429 holds back every other request
+        if error.kind == RATE_LIMITED and self.budget is not None:
+            self.budget.pause(error.retry_after or RATE_LIMIT_PAUSE)
+
+    def _settle(self, reservation, complete):
+        usage = reservation.usage
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        text = "".join(reservation.parts)
+        if not complete and usage is None and not text:
+            # Failed before anything was generated: nothing was used
+            if self.budget is not None:
+                self.budget.refund(reservation.reserved)
+            return
+        if prompt_tokens:
+            # Moves a tenth of the way towards the latest ratio
+            self.prompt_ratio += (prompt_tokens / reservation.raw_prompt_estimate - self.prompt_ratio) / 10
+        else:
+            prompt_tokens = reservation.prompt_estimate
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(text)
+        if self.budget is not None:
+            self.budget.refund(reservation.reserved - prompt_tokens - completion_tokens)
+        if not complete:
+            # An abandoned or broken stream says nothing about reading lengths
+            return
+        truncated = reservation.finish_reason == "length"
+        with self._lock:
+            stats = self._spreads[reservation.spread]
+            stats.readings += 1
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.completions.append(completion_tokens)
+            if truncated:
+                stats.truncated += 1
+                stats.floor = min(max(stats.floor, reservation.max_tokens * 2), MAX_TOKENS)
+        metrics.observe("llm_prompt_tokens_per_reading", prompt_tokens, TOKEN_BUCKETS, spread=reservation.spread)
+        metrics.observe("llm_completion_tokens_per_reading", completion_tokens, TOKEN_BUCKETS,
+                        spread=reservation.spread)
+        if truncated:
+            metrics.count("llm_truncated_readings_total", spread=reservation.spread)
+
+    def report(self):
+        # Tokens per reading by spread, for the readings seen so far
+        with self._lock:
+            spreads = dict(self._spreads)
+        report = {}
+        for spread, stats in spreads.items():
+            if not stats.readings:
+                continue
+            report[spread] = {
+                "readings": stats.readings,
+                "prompt_tokens_per_reading": round(stats.prompt_tokens / stats.readings, 1),
+                "completion_tokens_per_reading": round(stats.completion_tokens / stats.readings, 1),
+                "truncated": stats.truncated,
+                "max_tokens": self.max_tokens(spread, stats.num_cards),
+            }
+        return report
+
+
+token_accountant = TokenAccountant()